@@ -0,0 +1,146 @@
+""" Delivery of admin messages to every connected admin UI.
+"""
+import asyncio
+import uuid
+from collections import deque
+from typing import Awaitable, Callable, List, Optional
+
+import metrics
+
+ADMIN_CLIENTS = metrics.gauge(
+    'agent_admin_clients',
+    'Admin UI websockets connected.'
+)
+ADMIN_CLIENTS_LAGGING = metrics.counter(
+    'agent_admin_clients_lagging_total',
+    'Admin UI websockets closed for falling behind.'
+)
+
+
+class AdminClient:
+    """ The admin messages waiting to be sent to one admin UI.
+
+        At most buffer_size messages are kept. A client with more than that
+        waiting is marked lagging and receives nothing more; it has to be
+        disconnected, since the messages it missed would leave it out of date.
+    """
+    def __init__(self, buffer_size: int):
+        self.buffer = deque()
+        self.buffer_size = buffer_size
+        self.lagging = False
+        self.ready = asyncio.Event()
+
+    def offer(self, msg: str) -> None:
+        if self.lagging:
+            return
+        if len(self.buffer) >= self.buffer_size:
+            self.lagging = True
+            self.buffer.clear()
+            ADMIN_CLIENTS_LAGGING.inc()
+        else:
+            self.buffer.append(msg)
+        self.ready.set()
+
+    async def next_batch(self, max_batch_size: int) -> List[str]:
+        """ Wait for messages and return up to max_batch_size of them, oldest
+            first. Returns an empty list once the client is lagging.
+        """
+        while not self.buffer and not self.lagging:
+            self.ready.clear()
+            await self.ready.wait()
+
+        batch = []
+        while self.buffer and len(batch) < max_batch_size:
+            batch.append(self.buffer.popleft())
+        return batch
+
+
+class AdminHub:
+    """ Fan each admin message out to all connected admin UIs.
+
+        Every client has its own bounded buffer, so a slow client only holds
+        up itself.
+
+        Messages are numbered, and the last history_size of them are kept
+        whether or not a client is connected, older ones being discarded.
+        Numbers start again when the agent restarts, so they come with an
+        epoch, random for each hub. A client reconnecting with the epoch and
+        number of the last message it saw is sent the messages it missed. If
+        the epoch differs or some of them were already discarded, it is sent
+        a reset entry instead, telling it to request the whole state again.
+
+        Each message is sent wrapped in an entry carrying its epoch and number:
+
+            {"epoch": "9f3c...", "seq": 42, "msg": {...}}
+            {"epoch": "9f3c...", "seq": 42, "reset": true}
+
+        Messages are kept as plaintext. When pack is given, each frame is
+        passed through it just before being sent.
+    """
+    def __init__(self, client_buffer_size: int = 1000, max_batch_size: int = 50,
+                 history_size: Optional[int] = None,
+                 pack: Optional[Callable[[str], Awaitable[str]]] = None):
+        self.client_buffer_size = client_buffer_size
+        self.max_batch_size = max_batch_size
+        self.pack = pack
+        # Replaying more than a client buffer holds would mark the client lagging.
+        self.history = deque(maxlen=min(history_size or client_buffer_size, client_buffer_size))
+        self.epoch = uuid.uuid4().hex
+        self.seq = 0
+        self.clients = set()
+
+    def connect(self, since: Optional[int] = None, epoch: Optional[str] = None) -> AdminClient:
+        """ Add a client.
+
+            :param since: Number of the last message seen by a reconnecting
+                client, or None for a client without previous state.
+            :param epoch: Epoch of that message.
+        """
+        client = AdminClient(self.client_buffer_size)
+        if since is not None:
+            oldest = self.history[0][0] if self.history else self.seq + 1
+            if epoch == self.epoch and oldest - 1 <= since <= self.seq:
+                for seq, entry in self.history:
+                    if seq > since:
+                        client.offer(entry)
+            else:
+                client.offer('{{"epoch":"{}","seq":{},"reset":true}}'.format(self.epoch, self.seq))
+
+        self.clients.add(client)
+        ADMIN_CLIENTS.set(len(self.clients))
+        return client
+
+    def disconnect(self, client: AdminClient) -> None:
+        self.clients.discard(client)
+        ADMIN_CLIENTS.set(len(self.clients))
+
+    def publish(self, msg: str) -> None:
+        """ Number msg, keep it for replay and queue it for every client.
+
+            :param msg: The message, serialized as a JSON document.
+        """
+        self.seq += 1
+        entry = '{{"epoch":"{}","seq":{},"msg":{}}}'.format(self.epoch, self.seq, msg)
+        self.history.append((self.seq, entry))
+        for client in self.clients:
+            client.offer(entry)
+
+    async def next_frame(self, client: AdminClient):
+        """ Wait for the next websocket frame to send to client.
+
+            Entries that arrived together are sent in one frame, as a JSON
+            array; a single entry is sent as is.
+
+            :return: The frame, or None once the client is lagging.
+        """
+        batch = await client.next_batch(self.max_batch_size)
+        if not batch:
+            return None
+        if len(batch) == 1:
+            frame = batch[0]
+        else:
+            # The admin UI reads a frame holding a list as several messages.
+            frame = '[' + ','.join(batch) + ']'
+        if self.pack:
+            frame = await self.pack(frame)
+        return frame
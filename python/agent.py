@@ -10,12 +10,36 @@ from typing import Optional
 
 import aiohttp
 import socket
-from indy import wallet, did, error, crypto, pairwise
+from indy import wallet, did, error, crypto
 
 import indy_sdk_utils as utils
+import metrics
+from admin_hub import AdminHub
+from crypto_executor import CryptoExecutor
+from outbound import OutboundDispatcher
+from queues import MeteredQueue, WeightedScheduler
 from python_agent_utils.messages.message import Message
 from router.family_router import FamilyRouter
 from serializer.json_serializer import JSONSerializer as Serializer
+from worker_pool import KeyedWorkerPool
+
+
+# Members of a packed (encrypted) wire message.
+JWE_KEYS = frozenset(('protected', 'iv', 'ciphertext', 'tag'))
+
+# Worker pool key of messages from the admin UI, handled in the order sent.
+ADMIN_ORDERING_KEY = 'admin'
+
+STAGE_SECONDS = metrics.histogram(
+    'agent_message_stage_seconds',
+    'Time spent in each stage of handling a message, by message family.',
+    ['stage', 'family']
+)
+MESSAGE_FAILURES = metrics.counter(
+    'agent_message_failures_total',
+    'Messages that could not be parsed, unpacked or handled.',
+    ['stage']
+)
 
 
 class WalletConnectionException(Exception):
@@ -25,7 +49,11 @@ class WalletConnectionException(Exception):
 class Agent:
     """ Agent class storing all needed elements for agent operation.
     """
-    def __init__(self, hostname=None, port=None):
+    def __init__(self, hostname=None, port=None, workers=1,
+                 http_timeout=30, http_connections_per_host=10, max_queue_size=0,
+                 outbound_batch_window=0.005, outbound_max_retries=5, crypto_concurrency=4,
+                 admin_buffer_size=1000, admin_batch_size=50,
+                 admin_queue_weight=10, peer_queue_weight=1):
         self.owner = None
         self.wallet_handle = None
         self.endpoint = None
@@ -36,13 +64,31 @@ class Agent:
         self.initialized = False
         self.modules = {}
         self.family_router = FamilyRouter()
-        self.message_queue = asyncio.Queue()
+        self.message_queue = MeteredQueue('peer', max_queue_size)
+        self.admin_queue = MeteredQueue('admin', max_queue_size)
+        self.inbound = WeightedScheduler([
+            (self.admin_queue, admin_queue_weight),
+            (self.message_queue, peer_queue_weight)
+        ])
+        # Bounding the pool too makes a busy agent fill the inbound queues and
+        # turn senders away, rather than hold every unpacked message.
+        self.worker_pool = KeyedWorkerPool(
+            self.route_message_to_module, workers, max_pending=max_queue_size)
+        self.crypto = CryptoExecutor(crypto_concurrency)
         self.admin_key = None
         self.agent_admin_key = None
-        self.outbound_admin_message_queue = asyncio.Queue()
+        self.admin_hub = AdminHub(admin_buffer_size, admin_batch_size, pack=self.pack_admin_frame)
         self.offer_endpoint = None
         self.hostname = hostname
         self.port = port
+        self.http_timeout = http_timeout
+        self.http_connections_per_host = http_connections_per_host
+        self.http_session = None
+        self.outbound = OutboundDispatcher(
+            self.open_http_session,
+            batch_window=outbound_batch_window,
+            max_retries=outbound_max_retries
+        )
         self.init_endpoint()
 
     def register_module(self, module):
@@ -56,25 +102,116 @@ class Agent:
         self.endpoint += (':' + str(self.port) if self.port else '') + '/indy'
         self.offer_endpoint += (':' + str(self.port) if self.port else '') + '/offer'
 
+    def open_http_session(self) -> aiohttp.ClientSession:
+        """ Create the session shared by all outbound HTTP requests.
+
+            Connections are kept alive and pooled per host, and DNS lookups are
+            cached, so repeated messages to the same endpoint reuse a connection.
+        """
+        if self.http_session is None or self.http_session.closed:
+            connector = aiohttp.TCPConnector(
+                limit_per_host=self.http_connections_per_host,
+                keepalive_timeout=30,
+                use_dns_cache=True,
+                ttl_dns_cache=300
+            )
+            self.http_session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.http_timeout)
+            )
+        return self.http_session
+
+    async def close_http_session(self):
+        if self.http_session:
+            await self.http_session.close()
+        self.http_session = None
+
+    async def shutdown(self):
+        """ Release resources held by the agent.
+        """
+        await self.outbound.stop()
+        await self.close_http_session()
+        await self.disconnect_wallet()
+
     async def route_message_to_module(self, message):
-        return await self.family_router.route(message)
+        msg_type = message.get(Message.TYPE)
+        family = self.family_router.family_label(msg_type)
+        try:
+            with STAGE_SECONDS.time(stage='route', family=family):
+                route = self.family_router.lookup(msg_type)
+
+            if route is not None and route.needs_wallet and not self.initialized:
+                print('No wallet connected, dropping message: {}'.format(msg_type))
+                return None
+
+            await self.resolve_dids(message, family)
+
+            with STAGE_SECONDS.time(stage='handle', family=family):
+                if route is None:
+                    return await self.family_router.route(message)
+                return await route.handler(message)
+        except Exception:
+            MESSAGE_FAILURES.inc(stage='handle')
+            raise
 
     async def handle_incoming(self):
-        try:
-            wire_msg_bytes = await self.message_queue.get()
+        """ Unpack the next queued messages and hand them to the worker pool.
+
+            Messages already waiting are unpacked together, up to the crypto
+            concurrency. Admin messages are taken ahead of peer messages, as
+            weighted by the inbound scheduler, and jump the worker pool queue so
+            the admin UI stays responsive under peer load. Messages are keyed by
+            sender verkey so that messages from one connection are routed in the
+            order they were received.
+        """
+        batch = await self.inbound.get_batch(self.crypto.concurrency)
 
-            msg = await self.unpack_wire_msg(wire_msg_bytes)
-            if msg:
-                return await self.route_message_to_module(msg)
-        except Exception as e:
-            print("\n\n--- Message Processing failed --- \n\n")
-            traceback.print_exc()
+        msgs = await asyncio.gather(
+            *(self.unpack_wire_msg(wire_msg) for _, wire_msg in batch),
+            return_exceptions=True
+        )
+        for (queue, _), msg in zip(batch, msgs):
+            if isinstance(msg, Exception):
+                MESSAGE_FAILURES.inc(stage='unpack')
+                print("\n\n--- Message Processing failed --- \n\n")
+                traceback.print_exception(type(msg), msg, msg.__traceback__)
+            elif msg:
+                from_admin = queue is self.admin_queue
+                try:
+                    key = self.ordering_key(msg, from_admin)
+                except Exception:
+                    MESSAGE_FAILURES.inc(stage='handle')
+                    print("\n\n--- Message Processing failed --- \n\n")
+                    traceback.print_exc()
+                    continue
+                await self.worker_pool.submit(key, msg, urgent=from_admin)
+
+    def ordering_key(self, msg: Message, from_admin: bool = False):
+        """ Key of the worker pool queue msg is handled in.
+
+            Messages from one sender share a key, so they are handled in order,
+            unless their handler is registered as safe to run concurrently.
+            Messages from the admin UI share a key of their own, never queued
+            behind peer messages. Other messages without an authenticated
+            sender have no order to keep and get a key of their own.
+        """
+        route = self.family_router.lookup(msg.get(Message.TYPE))
+        if route is not None and route.concurrent:
+            return msg.id
+        if from_admin:
+            return ADMIN_ORDERING_KEY
+        return msg.context.get('from_key') or msg.id
 
     async def start(self):
         """ Message processing loop task.
         """
-        while True:
-            await self.handle_incoming()
+        self.open_http_session()
+        self.worker_pool.start()
+        try:
+            while True:
+                await self.handle_incoming()
+        finally:
+            await self.worker_pool.stop()
 
     async def connect_wallet(self, agent_name, passphrase, ephemeral=False):
         """ Create if not already exists and open wallet.
@@ -116,6 +253,7 @@ class Agent:
         try:
             if self.wallet_handle:
                 await wallet.close_wallet(self.wallet_handle)
+                utils.clear_caches()
 
             self.wallet_handle = await wallet.open_wallet(
                 wallet_config,
@@ -137,6 +275,7 @@ class Agent:
         """
         if self.wallet_handle:
             await wallet.close_wallet(self.wallet_handle)
+        utils.clear_caches()
         self.initialized = False
         self.owner = ''
         self.wallet_handle = None
@@ -179,66 +318,71 @@ class Agent:
     async def unpack_agent_message(self, wire_msg_bytes):
         if isinstance(wire_msg_bytes, str):
             wire_msg_bytes = bytes(wire_msg_bytes, 'utf-8')
-        unpacked = json.loads(
-            await crypto.unpack_message(
+        # The family is only known once unpacked, so the stage is observed last.
+        started = time.monotonic()
+        unpacked = Serializer.backend().loads(
+            await self.crypto.unpack(
                 self.wallet_handle,
                 wire_msg_bytes
             )
         )
-
-        from_key = None
-        from_did = None
-        if 'sender_verkey' in unpacked:
-            from_key = unpacked['sender_verkey']
-            from_did = await utils.did_for_key(self.wallet_handle, unpacked['sender_verkey'])
-
-        to_key = unpacked['recipient_verkey']
-        to_did = await utils.did_for_key(self.wallet_handle, unpacked['recipient_verkey'])
+        unpacked_at = time.monotonic()
 
         msg = Serializer.deserialize(unpacked['message'])
+        STAGE_SECONDS.observe(unpacked_at - started, stage='unpack',
+                              family=self.family_router.family_label(msg.get(Message.TYPE)))
 
+        # The DIDs are added by resolve_dids, once the message is handled.
         msg.context = {
-            'from_did': from_did,  # Could be None
-            'to_did': to_did,  # Could be None
-            'from_key': from_key,  # Could be None
-            'to_key': to_key
+            'from_key': unpacked.get('sender_verkey'),  # Could be None
+            'to_key': unpacked['recipient_verkey']
         }
         return msg
 
-    async def send_message_to_agent(self, to_did, msg: Message):
-        print("Sending:", msg)
-        their_did = to_did
-
-        pairwise_info = json.loads(await pairwise.get_pairwise(self.wallet_handle, their_did))
-        pairwise_meta = json.loads(pairwise_info['metadata'])
+    async def resolve_dids(self, msg: Message, family: str) -> None:
+        """ Add the DIDs of the sender and recipient keys of an unpacked
+            message to its context.
 
-        my_did = pairwise_info['my_did']
-        their_endpoint = pairwise_meta['their_endpoint']
-        their_vk = pairwise_meta['their_vk']
+            Done just before the message is handled, after the earlier
+            messages of the same sender: those may store the DID, as a
+            connection response does.
+        """
+        context = msg.context
+        if 'to_key' not in context:
+            return
 
-        my_vk = await did.key_for_local_did(self.wallet_handle, my_did)
+        with STAGE_SECONDS.time(stage='did_for_key', family=family):
+            from_key = context['from_key']
+            context['from_did'] = await utils.did_for_key(self.wallet_handle, from_key) \
+                if from_key else None  # Could be None
+            context['to_did'] = await utils.did_for_key(self.wallet_handle, context['to_key'])
 
-        await self.send_message_to_endpoint_and_key(their_vk, their_endpoint, msg, my_vk)
+    async def send_message_to_agent(self, to_did, msg: Message):
+        print('Sending {} to {}'.format(msg.get(Message.TYPE), to_did))
+        connection = await utils.get_pairwise_connection(self.wallet_handle, to_did)
+
+        await self.send_message_to_endpoint_and_key(
+            connection['their_vk'],
+            connection['their_endpoint'],
+            msg,
+            connection['my_vk']
+        )
 
     # used directly when sending to an endpoint without a known did
     async def send_message_to_endpoint_and_key(self, their_ver_key, their_endpoint,
                                                msg, my_ver_key=None):
         # If my_ver_key is omitted, anoncrypt is used inside pack.
-        wire_message = await crypto.pack_message(
-            self.wallet_handle,
-            Serializer.serialize(msg).decode('utf-8'),
-            [their_ver_key],
-            my_ver_key
-        )
+        family = self.family_router.family_label(msg.get(Message.TYPE))
+        with STAGE_SECONDS.time(stage='pack', family=family):
+            wire_message = await self.crypto.pack(
+                self.wallet_handle,
+                Serializer.serialize_to_str(msg),
+                [their_ver_key],
+                my_ver_key
+            )
 
-        async with aiohttp.ClientSession() as session:
-            headers = {
-                'content-type': 'application/ssi-agent-wire'
-            }
-            async with session.post(their_endpoint, data=wire_message, headers=headers) as resp:
-                if resp.status != 202:
-                    print(resp.status)
-                    print(await resp.text())
+        # Delivery happens in the background, with retries.
+        self.outbound.send(their_endpoint, wire_message)
 
     async def setup_admin(self, admin_key):
         self.admin_key = admin_key
@@ -246,36 +390,55 @@ class Agent:
         print("Admin key: ", self.agent_admin_key)
 
     async def send_admin_message(self, msg: Message):
-        if self.agent_admin_key and self.admin_key:
-            msg = await crypto.pack_message(
-                self.wallet_handle,
-                Serializer.serialize(msg).decode('utf-8'),
-                [self.admin_key],
-                self.agent_admin_key
-            )
-            msg = msg.decode('ascii')
-        else:
-            msg = msg.as_json()
+        self.admin_hub.publish(Serializer.serialize_to_str(msg))
 
-        await self.outbound_admin_message_queue.put(msg)
+    async def pack_admin_frame(self, frame: str) -> str:
+        """ Pack a websocket frame for the admin UI when an admin key is set.
 
-    async def unpack_wire_msg(self, wire_msg) -> Optional:
-        # Try to unpack message assuming it's not encrypted
-        msg = ""
-        try:
-            msg = Serializer.deserialize(wire_msg)
-        except Exception as e:
-            print("Message encrypted, attempting to unpack...")
+            Admin messages are packed a frame at a time rather than one by
+            one, so a burst of them costs a single pack.
+        """
+        if not (self.agent_admin_key and self.admin_key):
+            return frame
+        packed = await self.crypto.pack(
+            self.wallet_handle,
+            frame,
+            [self.admin_key],
+            self.agent_admin_key
+        )
+        return packed.decode('ascii')
 
-        # TODO: More graceful checking here
-        # (This is an artifact of the provisional wire format and connection protocol)
-        if not isinstance(msg, Message) or "@type" not in msg:
-            # Message IS encrypted so unpack it
-            try:
-                msg = await self.unpack_agent_message(wire_msg)
-            except Exception as e:
-                print('Failed to unpack message: {}\n\nError: {}'.format(wire_msg, e))
-                traceback.print_exc()
-                return None
+    async def unpack_wire_msg(self, wire_msg) -> Optional[Message]:
+        """ Parse a wire message, unpacking it first if it is encrypted.
 
-        return msg
+            The message is parsed once and its structure decides the path:
+            plaintext messages carry an @type, while packed messages are JWEs.
+        """
+        try:
+            parsed = Serializer.backend().loads(wire_msg)
+        except ValueError as e:
+            MESSAGE_FAILURES.inc(stage='parse')
+            print('Failed to parse message: {}\n\nError: {}'.format(wire_msg, e))
+            return None
+
+        if not isinstance(parsed, dict):
+            MESSAGE_FAILURES.inc(stage='parse')
+            print('Unrecognized message format: {}'.format(wire_msg))
+            return None
+
+        if '@type' in parsed:
+            return Message(parsed)
+
+        if not JWE_KEYS.issubset(parsed):
+            MESSAGE_FAILURES.inc(stage='parse')
+            print('Unrecognized message format: {}'.format(wire_msg))
+            return None
+
+        # Message IS encrypted so unpack it
+        try:
+            return await self.unpack_agent_message(wire_msg)
+        except Exception as e:
+            MESSAGE_FAILURES.inc(stage='unpack')
+            print('Failed to unpack message: {}\n\nError: {}'.format(wire_msg, e))
+            traceback.print_exc()
+            return None
@@ -0,0 +1,77 @@
+""" Compare serial and concurrent libindy packing and unpacking.
+
+    Run from the python directory:
+
+        python -m benchmarks.crypto_pack_unpack [--messages N] [--concurrency N]
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+import uuid
+
+sys.path.append('..')
+
+from indy import crypto, wallet
+
+from crypto_executor import CryptoExecutor, set_crypto_thread_pool_size
+
+MESSAGE = json.dumps({
+    '@type': 'did:sov:BzCbsNYhMrjHiqZDTUASHg;spec/basicmessage/1.0/message',
+    '@id': str(uuid.uuid4()),
+    '~l10n': {'locale': 'en'},
+    'sent_time': '2019-05-27 08:34:25.105373+00:00',
+    'content': 'Hello' * 20
+})
+
+
+def report(label, count, elapsed):
+    print('{:<20} {:>8.0f} msg/s ({:.3f}s for {})'.format(label, count / elapsed, elapsed, count))
+
+
+async def run(messages: int, concurrency: int):
+    wallet_config = json.dumps({'id': 'benchmark-{}'.format(uuid.uuid4().hex)})
+    wallet_credentials = json.dumps({'key': 'benchmark'})
+    await wallet.create_wallet(wallet_config, wallet_credentials)
+    wallet_handle = await wallet.open_wallet(wallet_config, wallet_credentials)
+    try:
+        sender = await crypto.create_key(wallet_handle, '{}')
+        recipient = await crypto.create_key(wallet_handle, '{}')
+        executor = CryptoExecutor(concurrency)
+
+        start = time.perf_counter()
+        packed = [
+            await crypto.pack_message(wallet_handle, MESSAGE, [recipient], sender)
+            for _ in range(messages)
+        ]
+        report('serial pack', messages, time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(
+            executor.pack(wallet_handle, MESSAGE, [recipient], sender)
+            for _ in range(messages)
+        ))
+        report('concurrent pack', messages, time.perf_counter() - start)
+
+        start = time.perf_counter()
+        for wire_message in packed:
+            await crypto.unpack_message(wallet_handle, wire_message)
+        report('serial unpack', messages, time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await executor.unpack_batch(wallet_handle, packed)
+        report('batch unpack', messages, time.perf_counter() - start)
+    finally:
+        await wallet.close_wallet(wallet_handle)
+        await wallet.delete_wallet(wallet_config, wallet_credentials)
+
+
+if __name__ == '__main__':
+    PARSER = argparse.ArgumentParser()
+    PARSER.add_argument('--messages', type=int, default=1000)
+    PARSER.add_argument('--concurrency', type=int, default=4)
+    ARGS = PARSER.parse_args()
+
+    set_crypto_thread_pool_size(ARGS.concurrency)
+    asyncio.get_event_loop().run_until_complete(run(ARGS.messages, ARGS.concurrency))
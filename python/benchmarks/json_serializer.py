@@ -0,0 +1,56 @@
+""" Compare JSON backends serializing and deserializing representative messages.
+
+    Run from the python directory:
+
+        python -m benchmarks.json_serializer [--iterations N]
+"""
+import argparse
+import sys
+import timeit
+
+sys.path.append('..')
+
+from python_agent_utils.messages.connection import Connection
+from python_agent_utils.messages.message import Message
+from serializer.json_serializer import BACKENDS, JSONSerializer as Serializer
+
+MY_DID = 'did:sov:QmWbsNYhMrjHiqZDTUTEJs'
+MY_VK = 'H3C2AVvLMv6gmMNam3uVAjZpfkcJCwDwnZn6z3wXmqPV'
+
+MESSAGES = {
+    'connection request': Connection.Request.build('Alice', MY_DID, MY_VK, 'http://localhost:8094/indy'),
+    'basicmessage': Message({
+        '@type': 'did:sov:BzCbsNYhMrjHiqZDTUASHg;spec/basicmessage/1.0/message',
+        '~l10n': {'locale': 'en'},
+        'sent_time': '2019-05-27 08:34:25.105373+00:00',
+        'content': 'Hello, how are you doing today?'
+    }),
+    'trust ping': Message({
+        '@type': 'did:sov:BzCbsNYhMrjHiqZDTUASHg;spec/trust_ping/1.0/ping_response',
+        '~thread': {Message.THREAD_ID: '518be002-de8e-456e-b3d5-8fe472477a86',
+                    Message.SENDER_ORDER: 0}
+    }),
+}
+
+
+def run(iterations: int):
+    for name in BACKENDS:
+        Serializer.select_backend(name)
+        print(name)
+        for label, msg in MESSAGES.items():
+            dump = Serializer.serialize(msg)
+            serialize = timeit.timeit(lambda: Serializer.serialize_to_str(msg), number=iterations)
+            deserialize = timeit.timeit(lambda: Serializer.deserialize(dump), number=iterations)
+            print('  {:<20} serialize {:>7.2f} us  deserialize {:>7.2f} us'.format(
+                label, serialize / iterations * 1e6, deserialize / iterations * 1e6))
+
+    print('Message.as_json (stdlib, for reference)')
+    for label, msg in MESSAGES.items():
+        elapsed = timeit.timeit(msg.as_json, number=iterations)
+        print('  {:<20} serialize {:>7.2f} us'.format(label, elapsed / iterations * 1e6))
+
+
+if __name__ == '__main__':
+    PARSER = argparse.ArgumentParser()
+    PARSER.add_argument('--iterations', type=int, default=100000)
+    run(PARSER.parse_args().iterations)
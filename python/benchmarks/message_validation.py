@@ -0,0 +1,113 @@
+""" Compare message validation with how it was done before: through field
+    objects created for each message, and with dateutil parsing every time.
+
+    Run from the python directory:
+
+        python -m benchmarks.message_validation [--iterations N]
+"""
+import argparse
+import sys
+import timeit
+
+import dateutil.parser
+
+sys.path.append('..')
+
+from python_agent_utils.messages.connection import Connection
+from python_agent_utils.messages.fields import DIDField, MapField, NonNegativeNumberField
+from python_agent_utils.messages.message import Message
+
+MY_DID = 'did:sov:QmWbsNYhMrjHiqZDTUTEJs'
+MY_VK = 'H3C2AVvLMv6gmMNam3uVAjZpfkcJCwDwnZn6z3wXmqPV'
+
+THREADED = Message({
+    '@type': 'did:sov:BzCbsNYhMrjHiqZDTUASHg;spec/basicmessage/1.0/message',
+    '~thread': {
+        Message.THREAD_ID: '518be002-de8e-456e-b3d5-8fe472477a86',
+        Message.SENDER_ORDER: 3,
+        Message.RECEIVED_ORDERS: {
+            'did:sov:BzCbsNYhMrjHiqZDTUASHg': 1,
+            'did:sov:QmWbsNYhMrjHiqZDTUTEJs': 2
+        }
+    },
+    'content': 'Hello, how are you doing today?'
+})
+
+TIMED = Message({
+    '@type': 'did:sov:BzCbsNYhMrjHiqZDTUASHg;spec/basicmessage/1.0/message',
+    '~timing': {
+        Message.IN_TIME: '2019-01-25 18:24:10.123456Z',
+        Message.OUT_TIME: '2019-01-25 18:25:00Z',
+        Message.STALE_TIME: '2019-01-26T00:00:00+00:00',
+        Message.EXPIRES_TIME: '2019-01-27T00:00:00+00:00'
+    },
+    'content': 'Hello, how are you doing today?'
+})
+
+REQUEST = Connection.Request.build('Alice', MY_DID, MY_VK, 'http://localhost:8094/indy')
+
+
+def field_objects_thread_block(msg):
+    """ Thread block validation as it was before schemas were compiled.
+    """
+    thread = msg[Message.THREAD_DECORATOR]
+    Message.check_for_attrs_in_message([Message.THREAD_ID, Message.SENDER_ORDER], thread)
+    non_neg_num = NonNegativeNumberField()
+    err = non_neg_num.validate(thread[Message.SENDER_ORDER])
+    if not err and thread.get(Message.RECEIVED_ORDERS):
+        err = MapField(DIDField(), non_neg_num).validate(thread[Message.RECEIVED_ORDERS])
+    if err:
+        raise ValueError(err)
+
+
+def field_objects_timing_block(msg):
+    """ Timing block validation as it was before: every time parsed by
+        dateutil, and the compared ones parsed a second time.
+    """
+    timing = msg[Message.TIMING_DECORATOR]
+    for f in Message.TIMING_TIMES:
+        if f in timing:
+            dateutil.parser.isoparse(timing[f])
+    if dateutil.parser.isoparse(timing[Message.IN_TIME]) > \
+            dateutil.parser.isoparse(timing[Message.OUT_TIME]):
+        raise ValueError('in_time cannot be greater than out_time')
+    if dateutil.parser.isoparse(timing[Message.STALE_TIME]) > \
+            dateutil.parser.isoparse(timing[Message.EXPIRES_TIME]):
+        raise ValueError('stale_time cannot be greater than expires_time')
+
+
+def field_objects_request(request):
+    """ Connection request validation as it was before schemas were compiled.
+    """
+    request.check_for_attrs([('@type', Connection.REQUEST), '@id', 'label', Connection.CONNECTION])
+    Message.check_for_attrs_in_message(['did', 'did_doc'], request[Connection.CONNECTION])
+    did_doc = request[Connection.CONNECTION]['did_doc']
+    Message.check_for_attrs_in_message(['@context', 'publicKey', 'service'], did_doc)
+    for block in did_doc['publicKey']:
+        Message.check_for_attrs_in_message(['id', 'type', 'controller', 'publicKeyBase58'], block)
+    for block in did_doc['service']:
+        Message.check_for_attrs_in_message(
+            [('type', 'IndyAgent'), 'recipientKeys', 'serviceEndpoint'], block
+        )
+
+
+CASES = [
+    ('~thread', lambda: field_objects_thread_block(THREADED), THREADED.validate_thread_block),
+    ('~timing', lambda: field_objects_timing_block(TIMED), TIMED.validate_timing_block),
+    ('connection request', lambda: field_objects_request(REQUEST),
+     lambda: Connection.Request.validate(REQUEST)),
+]
+
+
+def run(iterations: int):
+    for label, before_fn, now_fn in CASES:
+        before = timeit.timeit(before_fn, number=iterations)
+        after = timeit.timeit(now_fn, number=iterations)
+        print('{:<20} before {:>7.2f} us  now {:>7.2f} us'.format(
+            label, before / iterations * 1e6, after / iterations * 1e6))
+
+
+if __name__ == '__main__':
+    PARSER = argparse.ArgumentParser()
+    PARSER.add_argument('--iterations', type=int, default=100000)
+    run(PARSER.parse_args().iterations)
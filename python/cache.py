@@ -0,0 +1,44 @@
+""" Small in-memory caches used to avoid repeated wallet lookups.
+"""
+from collections import OrderedDict
+
+
+class LRUCache:
+    """ Mapping holding at most `maxsize` entries, evicting the least recently
+        used entry when full.
+    """
+    MISSING = object()
+
+    def __init__(self, maxsize: int = 1024):
+        if maxsize < 1:
+            raise ValueError('maxsize must be at least 1')
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+
+    def get(self, key, default=MISSING):
+        """ Return the value stored for key, or default (LRUCache.MISSING if
+            not given) when key is not cached.
+        """
+        try:
+            self.entries.move_to_end(key)
+        except KeyError:
+            return default
+        return self.entries[key]
+
+    def put(self, key, value) -> None:
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def pop(self, key, default=None):
+        return self.entries.pop(key, default)
+
+    def clear(self) -> None:
+        self.entries.clear()
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __len__(self):
+        return len(self.entries)
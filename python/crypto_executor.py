@@ -0,0 +1,46 @@
+""" Concurrent execution of libindy message packing and unpacking.
+
+    libindy runs pack and unpack on its own crypto thread pool, off the event
+    loop. Awaiting those calls one at a time only ever keeps one of those
+    threads busy; CryptoExecutor lets several run at once, bounded to the size
+    of the thread pool.
+"""
+import asyncio
+import json
+from typing import Iterable, List, Optional
+
+from indy import crypto, libindy
+
+
+def set_crypto_thread_pool_size(size: int):
+    """ Set the number of threads libindy uses for pack and unpack.
+    """
+    libindy.set_runtime_config(json.dumps({'crypto_thread_pool_size': size}))
+
+
+class CryptoExecutor:
+    """ Pack and unpack messages with at most `concurrency` operations in
+        flight at once.
+    """
+    def __init__(self, concurrency: int = 4):
+        self.concurrency = concurrency
+        self.semaphore = asyncio.Semaphore(concurrency)
+
+    async def pack(self, wallet_handle: int, message: str, recipient_keys: List[str],
+                   sender_key: Optional[str] = None) -> bytes:
+        async with self.semaphore:
+            return await crypto.pack_message(wallet_handle, message, recipient_keys, sender_key)
+
+    async def unpack(self, wallet_handle: int, wire_message: bytes) -> bytes:
+        async with self.semaphore:
+            return await crypto.unpack_message(wallet_handle, wire_message)
+
+    async def unpack_batch(self, wallet_handle: int, wire_messages: Iterable[bytes]) -> list:
+        """ Unpack several messages concurrently.
+
+            :return: Unpacked message or raised exception for each message, in order.
+        """
+        return await asyncio.gather(
+            *(self.unpack(wallet_handle, wire_message) for wire_message in wire_messages),
+            return_exceptions=True
+        )
@@ -24,7 +24,10 @@ from modules.basicmessage import AdminBasicMessage, BasicMessage
 from modules.trustping import AdminTrustPing, TrustPing
 from modules.protocol_discovery import ProtocolDiscovery, AdminProtocolDiscovery
 from modules.staticconnection import AdminStaticConnection
+from crypto_executor import set_crypto_thread_pool_size
+from metrics import metrics_handler
 from post_message_handler import PostMessageHandler
+from serializer.json_serializer import BACKENDS as JSON_BACKENDS, JSONSerializer as Serializer
 from websocket_message_handler import WebSocketMessageHandler
 from agent import Agent
 
@@ -43,18 +46,123 @@ if __name__ == "__main__":
     parser.add_argument("--ephemeralwallet", action="store_true", help="Use ephemeral wallets")
     parser.add_argument("--adminkey", type=str, help="Base58 encoded admin interface key")
     parser.add_argument("--hostname", type=str, help="Endpoint hostname")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=4,
+        help="Number of tasks handling inbound messages concurrently"
+    )
+    parser.add_argument(
+        "--admin-queue-weight",
+        type=int,
+        default=10,
+        help="Admin UI messages handled for every --peer-queue-weight messages from other agents"
+    )
+    parser.add_argument(
+        "--peer-queue-weight",
+        type=int,
+        default=1,
+        help="Messages from other agents handled for every --admin-queue-weight admin UI messages"
+    )
+    parser.add_argument(
+        "--http-timeout",
+        type=float,
+        default=30,
+        help="Timeout in seconds for delivering a message to another agent"
+    )
+    parser.add_argument(
+        "--http-connections-per-host",
+        type=int,
+        default=10,
+        help="Maximum number of open connections to a single agent endpoint"
+    )
+    parser.add_argument(
+        "--max-queue-size",
+        type=int,
+        default=1000,
+        help="Maximum number of inbound messages waiting to be processed"
+    )
+    parser.add_argument(
+        "--max-body-size",
+        type=int,
+        default=1024 ** 2,
+        help="Maximum size in bytes of an inbound message"
+    )
+    parser.add_argument(
+        "--max-batch-size",
+        type=int,
+        default=100,
+        help="Maximum number of messages accepted in one request to /indy/batch"
+    )
+    parser.add_argument(
+        "--outbound-batch-window",
+        type=float,
+        default=0.005,
+        help="Seconds to wait for more messages to the same endpoint before sending (0 disables)"
+    )
+    parser.add_argument(
+        "--outbound-max-retries",
+        type=int,
+        default=5,
+        help="Number of times delivery of a message to another agent is retried"
+    )
+    parser.add_argument(
+        "--crypto-threads",
+        type=int,
+        default=4,
+        help="Number of libindy threads packing and unpacking messages"
+    )
+    parser.add_argument(
+        "--admin-buffer-size",
+        type=int,
+        default=1000,
+        help="Admin messages kept for replay, and for an admin UI before it is disconnected as too slow"
+    )
+    parser.add_argument(
+        "--admin-batch-size",
+        type=int,
+        default=50,
+        help="Most admin messages sent, and packed, together in one websocket frame"
+    )
+    parser.add_argument(
+        "--json-backend",
+        choices=list(JSON_BACKENDS),
+        help="JSON library used for messages (default: fastest installed)"
+    )
     args = parser.parse_args()
 
+    set_crypto_thread_pool_size(args.crypto_threads)
+    Serializer.select_backend(args.json_backend)
+
     # Configure webapp
     LOOP = asyncio.get_event_loop()
-    WEBAPP = web.Application()
+    # The batch route reads its larger bodies itself, within its own limit.
+    WEBAPP = web.Application(client_max_size=args.max_body_size)
     aiohttp_jinja2.setup(WEBAPP, loader=jinja2.FileSystemLoader('view'))
 
-    AGENT = Agent(args.hostname, args.port)
-    POST_MESSAGE_HANDLER = PostMessageHandler(AGENT.message_queue)
-    WEBSOCKET_MESSAGE_HANDLER = WebSocketMessageHandler(
+    AGENT = Agent(
+        args.hostname,
+        args.port,
+        workers=args.workers,
+        http_timeout=args.http_timeout,
+        http_connections_per_host=args.http_connections_per_host,
+        max_queue_size=args.max_queue_size,
+        outbound_batch_window=args.outbound_batch_window,
+        outbound_max_retries=args.outbound_max_retries,
+        crypto_concurrency=args.crypto_threads,
+        admin_buffer_size=args.admin_buffer_size,
+        admin_batch_size=args.admin_batch_size,
+        admin_queue_weight=args.admin_queue_weight,
+        peer_queue_weight=args.peer_queue_weight
+    )
+    POST_MESSAGE_HANDLER = PostMessageHandler(
         AGENT.message_queue,
-        AGENT.outbound_admin_message_queue
+        max_body_size=args.max_body_size,
+        max_batch_size=args.max_batch_size
+    )
+    WEBSOCKET_MESSAGE_HANDLER = WebSocketMessageHandler(
+        AGENT.admin_queue,
+        AGENT.admin_hub
     )
 
     ROUTES = [
@@ -62,6 +170,8 @@ if __name__ == "__main__":
         web.get('/ws', WEBSOCKET_MESSAGE_HANDLER.ws_handler),
         web.static('/res', 'view/res'),
         web.post('/indy', POST_MESSAGE_HANDLER.handle_message),
+        web.post('/indy/batch', POST_MESSAGE_HANDLER.handle_batch),
+        web.get('/metrics', metrics_handler),
     ]
 
     WEBAPP['agent'] = AGENT
@@ -116,3 +226,6 @@ if __name__ == "__main__":
         LOOP.run_forever()
     except KeyboardInterrupt:
         print("exiting")
+    finally:
+        LOOP.run_until_complete(AGENT.shutdown())
+        LOOP.run_until_complete(RUNNER.cleanup())
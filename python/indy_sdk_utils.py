@@ -1,7 +1,37 @@
 """ Wrappers around Indy-SDK functions to overcome shortcomings in the SDK.
 """
 import json
-from indy import did, non_secrets, error
+from typing import Optional
+
+from indy import did, non_secrets, pairwise, error
+
+from cache import LRUCache
+
+# Verkey to DID map kept in front of the 'key-to-did' wallet records. Keys not
+# found in the wallet are cached as None.
+KEY_TO_DID_CACHE = LRUCache(maxsize=4096)
+
+# Connection details needed to message a pairwise peer, keyed by their DID.
+PAIRWISE_CACHE = LRUCache(maxsize=4096)
+
+
+# Every cache of wallet contents, including those of other modules.
+_WALLET_CACHES = [KEY_TO_DID_CACHE, PAIRWISE_CACHE]
+
+
+def register_wallet_cache(cache: LRUCache) -> LRUCache:
+    """ Have cache cleared along with the caches of this module.
+    """
+    _WALLET_CACHES.append(cache)
+    return cache
+
+
+def clear_caches():
+    """ Drop everything cached from the wallet. Must be called whenever the
+        open wallet is closed or changed.
+    """
+    for cache in _WALLET_CACHES:
+        cache.clear()
 
 
 async def create_and_store_my_did(wallet_handle):
@@ -17,6 +47,7 @@ async def create_and_store_my_did(wallet_handle):
         my_did,
         '{}'
     )
+    KEY_TO_DID_CACHE.put((wallet_handle, my_vk), my_did)
 
     return my_did, my_vk
 
@@ -40,11 +71,16 @@ async def store_their_did(wallet_handle, their_did, their_vk):
         their_did,
         '{}'
     )
+    KEY_TO_DID_CACHE.put((wallet_handle, their_vk), their_did)
 
 
 async def did_for_key(wallet_handle, key):
     """ Retrieve DID for a given key from the non_secrets verkey to DID map.
     """
+    _did = KEY_TO_DID_CACHE.get((wallet_handle, key))
+    if _did is not LRUCache.MISSING:
+        return _did
+
     _did = None
     try:
         _did = json.loads(
@@ -61,9 +97,119 @@ async def did_for_key(wallet_handle, key):
         else:
             raise e
 
+    if _did is None:
+        # store_their_did may have run while the wallet was read; keep what it
+        # cached rather than a miss that is no longer true.
+        cached = KEY_TO_DID_CACHE.get((wallet_handle, key))
+        if cached is not LRUCache.MISSING:
+            return cached
+    KEY_TO_DID_CACHE.put((wallet_handle, key), _did)
     return _did
 
 
+async def create_pairwise(wallet_handle, their_did, my_did, metadata: dict):
+    """ Create pairwise relationship between my did and their did, caching the
+        details later needed to send messages to them.
+    """
+    await pairwise.create_pairwise(
+        wallet_handle,
+        their_did,
+        my_did,
+        json.dumps(metadata)
+    )
+
+    PAIRWISE_CACHE.put((wallet_handle, their_did), {
+        'my_did': my_did,
+        'my_vk': metadata['my_vk'],
+        'their_vk': metadata['their_vk'],
+        'their_endpoint': metadata['their_endpoint'],
+    })
+
+
+async def get_pairwise_connection(wallet_handle, their_did) -> dict:
+    """ Retrieve my_did, my_vk, their_vk and their_endpoint of a pairwise
+        relationship. The returned dictionary is shared and must not be modified.
+    """
+    connection = PAIRWISE_CACHE.get((wallet_handle, their_did))
+    if connection is not LRUCache.MISSING:
+        return connection
+
+    pairwise_info = json.loads(await pairwise.get_pairwise(wallet_handle, their_did))
+    pairwise_meta = json.loads(pairwise_info['metadata'])
+
+    my_did = pairwise_info['my_did']
+    my_vk = pairwise_meta.get('my_vk')
+    if not my_vk:
+        my_vk = await did.key_for_local_did(wallet_handle, my_did)
+
+    connection = {
+        'my_did': my_did,
+        'my_vk': my_vk,
+        'their_vk': pairwise_meta['their_vk'],
+        'their_endpoint': pairwise_meta['their_endpoint'],
+    }
+    PAIRWISE_CACHE.put((wallet_handle, their_did), connection)
+    return connection
+
+
+def _record_value(record: dict):
+    try:
+        record_value = json.loads(record['value'])
+        if isinstance(record_value, dict):
+            record_value['_id'] = record['id']
+    except json.decoder.JSONDecodeError:
+        record_value = record['value']
+    return record_value
+
+
+async def iter_wallet_records(wallet_handle: int, search_type: str,
+                              query_json: str = json.dumps({}), fetch_size: int = 100,
+                              offset: int = 0, limit: Optional[int] = None):
+    """ Search for records of a given type in a wallet, yielding them as they
+        are fetched.
+
+        Records are fetched fetch_size at a time, and no more are fetched once
+        limit records were yielded or the caller stops iterating.
+
+    :param wallet_handle: Handle of the wallet to search.
+    :param search_type: Type of records to search.
+    :param query_json: MongoDB style query to wallet record tags.
+           See non_secrets.open_wallet_search.
+    :param fetch_size: Number of records fetched from the wallet at once.
+    :param offset: Number of matching records to skip.
+    :param limit: Maximum number of records to yield, or None for all of them.
+    """
+    if not search_type or limit == 0:
+        return
+
+    search_handle = await non_secrets.open_wallet_search(
+        wallet_handle, search_type, query_json, json.dumps({})
+    )
+    try:
+        yielded = 0
+        while True:
+            results = json.loads(
+                await non_secrets.fetch_wallet_search_next_records(
+                    wallet_handle, search_handle, fetch_size
+                )
+            )
+            records = results['records']
+            if not records:
+                return
+
+            if offset >= len(records):
+                offset -= len(records)
+                continue
+            for record in records[offset:]:
+                yield _record_value(record)
+                yielded += 1
+                if limit is not None and yielded >= limit:
+                    return
+            offset = 0
+    finally:
+        await non_secrets.close_wallet_search(search_handle)
+
+
 async def get_wallet_records(wallet_handle: int, search_type: str,
                              query_json: str = json.dumps({})) -> list:
     """ Search for records of a given type in a wallet.
@@ -74,27 +220,6 @@ async def get_wallet_records(wallet_handle: int, search_type: str,
            See non_secrets.open_wallet_search.
     :return: List of all records found.
     """
-    list_of_records = []
-    if search_type:
-        search_handle = \
-            await non_secrets.open_wallet_search(wallet_handle, search_type, query_json,
-                                                 json.dumps({'retrieveTotalCount': True}))
-        while True:
-            results_json = await non_secrets.fetch_wallet_search_next_records(wallet_handle,
-                                                                              search_handle, 10)
-            results = json.loads(results_json)
-
-            if results['totalCount'] == 0 or results['records'] is None:
-                break
-            for record in results['records']:
-                try:
-                    record_value = json.loads(record['value'])
-                    if isinstance(record_value, dict):
-                        record_value['_id'] = record['id']
-                except json.decoder.JSONDecodeError:
-                    record_value = record['value']
-                list_of_records.append(record_value)
-
-        await non_secrets.close_wallet_search(search_handle)
-
-    return list_of_records
+    return [
+        record async for record in iter_wallet_records(wallet_handle, search_type, query_json)
+    ]
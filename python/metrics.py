@@ -0,0 +1,171 @@
+""" Minimal metrics registry rendered in the Prometheus text format.
+"""
+import time
+from typing import Callable, Iterable, Optional
+
+from aiohttp import web
+
+
+class Metric:
+    """ Base class for metrics. Values are stored per tuple of label values.
+    """
+    TYPE = None
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+
+    def _key(self, labels: dict) -> tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError('{} expects labels {}, got {}'.format(
+                self.name, self.labelnames, tuple(labels)))
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _format_labels(self, key: tuple, extra: Optional[dict] = None) -> str:
+        pairs = list(zip(self.labelnames, key))
+        if extra:
+            pairs.extend(extra.items())
+        if not pairs:
+            return ''
+        return '{' + ','.join(
+            '{}="{}"'.format(name, value.replace('\\', '\\\\').replace('"', '\\"'))
+            for name, value in pairs
+        ) + '}'
+
+    def samples(self) -> Iterable[str]:
+        for key, value in sorted(self.values.items()):
+            yield '{}{} {}'.format(self.name, self._format_labels(key), value)
+
+    def render(self) -> str:
+        lines = [
+            '# HELP {} {}'.format(self.name, self.documentation),
+            '# TYPE {} {}'.format(self.name, self.TYPE),
+        ]
+        lines.extend(self.samples())
+        return '\n'.join(lines)
+
+
+class Counter(Metric):
+    TYPE = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    """ Gauge holding a set value, or reading it from `function` on render.
+    """
+    TYPE = 'gauge'
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 function: Callable[[], float] = None):
+        super().__init__(name, documentation, labelnames)
+        self.function = function
+
+    def set(self, value, **labels):
+        self.values[self._key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def samples(self) -> Iterable[str]:
+        if self.function is not None:
+            yield '{} {}'.format(self.name, self.function())
+            return
+        yield from super().samples()
+
+
+class Histogram(Metric):
+    TYPE = 'histogram'
+    DEFAULT_BUCKETS = (.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Iterable[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        if key not in self.values:
+            # Per bucket counts, followed by total count and sum.
+            self.values[key] = [0] * len(self.buckets) + [0, 0.0]
+        counts = self.values[key]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[i] += 1
+        counts[-2] += 1
+        counts[-1] += value
+
+    def time(self, **labels) -> 'Timer':
+        return Timer(self, labels)
+
+    def samples(self) -> Iterable[str]:
+        for key, counts in sorted(self.values.items()):
+            for bound, count in zip(self.buckets, counts):
+                yield '{}_bucket{} {}'.format(
+                    self.name, self._format_labels(key, {'le': repr(float(bound))}), count)
+            yield '{}_bucket{} {}'.format(
+                self.name, self._format_labels(key, {'le': '+Inf'}), counts[-2])
+            yield '{}_count{} {}'.format(self.name, self._format_labels(key), counts[-2])
+            yield '{}_sum{} {}'.format(self.name, self._format_labels(key), counts[-1])
+
+
+class Timer:
+    """ Context manager observing the time spent in its block in a histogram.
+    """
+    def __init__(self, histogram: Histogram, labels: dict):
+        self.histogram = histogram
+        self.labels = labels
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.monotonic()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.monotonic() - self.start, **self.labels)
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+
+    def register(self, metric: Metric) -> Metric:
+        if metric.name in self.metrics:
+            raise ValueError('Metric {} already registered'.format(metric.name))
+        self.metrics[metric.name] = metric
+        return metric
+
+    def unregister(self, name: str) -> None:
+        self.metrics.pop(name, None)
+
+    def render(self) -> str:
+        return '\n'.join(metric.render() for metric in self.metrics.values()) + '\n'
+
+
+REGISTRY = Registry()
+
+
+def counter(name, documentation, labelnames=()) -> Counter:
+    return REGISTRY.register(Counter(name, documentation, labelnames))
+
+
+def gauge(name, documentation, labelnames=(), function=None) -> Gauge:
+    return REGISTRY.register(Gauge(name, documentation, labelnames, function))
+
+
+def histogram(name, documentation, labelnames=(), buckets=Histogram.DEFAULT_BUCKETS) -> Histogram:
+    return REGISTRY.register(Histogram(name, documentation, labelnames, buckets))
+
+
+async def metrics_handler(_request):
+    """ Serve all registered metrics in the Prometheus text format.
+    """
+    return web.Response(text=REGISTRY.render(), content_type='text/plain')
@@ -1,14 +1,130 @@
+import asyncio
 import json
+from collections import OrderedDict
+from itertools import islice
+from typing import Optional
 
 import aiohttp_jinja2
 from indy import pairwise
 
-from indy_sdk_utils import get_wallet_records
+from indy_sdk_utils import iter_wallet_records
 from python_agent_utils.messages.message import Message
 from router.simple_router import SimpleRouter
 from . import Module
 
 
+class AdminState:
+    """ The invitations and pairwise connections shown in the admin UI.
+
+        The state is read from the wallet once, when first requested, and then
+        kept up to date in memory by the modules changing it. Each change is
+        also sent to the UI as a STATE_UPDATE message, so the UI does not have
+        to request the whole state again. Changes made while the state is being
+        read are applied once it is read, whether the read saw them or not.
+    """
+    INVITATIONS = 'invitations'
+    PAIRWISE_CONNECTIONS = 'pairwise_connections'
+
+    def __init__(self, agent):
+        self.agent = agent
+        self.load_lock = asyncio.Lock()
+        self.clear()
+
+    def clear(self) -> None:
+        self.wallet_handle = None
+        self.invitations = OrderedDict()
+        self.pairwise_connections = OrderedDict()
+        # (kind, key, value) of the changes made during a load, or None.
+        self.updates_during_load = None
+
+    @property
+    def loaded(self) -> bool:
+        return self.wallet_handle is not None and self.wallet_handle == self.agent.wallet_handle
+
+    async def load(self) -> None:
+        """ Read the state from the open wallet, unless already done.
+        """
+        if self.loaded:
+            return
+
+        async with self.load_lock:
+            if self.loaded:
+                return
+
+            wallet_handle = self.agent.wallet_handle
+            self.updates_during_load = []
+            try:
+                invitations = OrderedDict()
+                async for invitation in iter_wallet_records(wallet_handle, 'invitations'):
+                    invitations[invitation['_id']] = invitation
+
+                pairwise_connections = OrderedDict()
+                for pairwise_str in json.loads(await pairwise.list_pairwise(wallet_handle)):
+                    pairwise_record = json.loads(pairwise_str)
+                    pairwise_record['metadata'] = json.loads(pairwise_record['metadata'])
+                    pairwise_connections[pairwise_record['their_did']] = pairwise_record
+            finally:
+                updates, self.updates_during_load = self.updates_during_load or [], None
+
+            self.wallet_handle = wallet_handle
+            self.invitations = invitations
+            self.pairwise_connections = pairwise_connections
+            for kind, key, value in updates:
+                self._apply(kind, key, value)
+
+    def page(self, offset: int = 0, limit: Optional[int] = None) -> dict:
+        """ Invitations and pairwise connections from offset on, at most limit
+            of each, along with how many there are in total.
+
+            Pages are cut from the current state, not from a snapshot: entries
+            added or removed between two requests shift the entries after them,
+            so the next page may repeat or skip some. The STATE_UPDATE messages
+            sent for those changes let the UI make up for it.
+        """
+        end = offset + limit if limit is not None else None
+        return {
+            'offset': offset,
+            'invitations': list(islice(self.invitations.values(), offset, end)),
+            'invitations_total': len(self.invitations),
+            'pairwise_connections': list(islice(self.pairwise_connections.values(), offset, end)),
+            'pairwise_connections_total': len(self.pairwise_connections),
+        }
+
+    async def put_invitation(self, connection_key: str, invitation: Message) -> None:
+        value = dict(invitation.to_dict(), _id=connection_key)
+        await self._update(AdminState.INVITATIONS, connection_key, value)
+
+    async def remove_invitation(self, connection_key: str) -> None:
+        await self._update(AdminState.INVITATIONS, connection_key, None)
+
+    async def put_pairwise(self, their_did: str, my_did: str, metadata: dict) -> None:
+        value = {'my_did': my_did, 'their_did': their_did, 'metadata': metadata}
+        await self._update(AdminState.PAIRWISE_CONNECTIONS, their_did, value)
+
+    def _apply(self, kind: str, key: str, value: Optional[dict]) -> None:
+        items = self.invitations if kind == AdminState.INVITATIONS else self.pairwise_connections
+        if value is None:
+            items.pop(key, None)
+        else:
+            items[key] = value
+
+    async def _update(self, kind: str, key: str, value: Optional[dict]):
+        if self.loaded:
+            self._apply(kind, key, value)
+        elif self.updates_during_load is not None:
+            self.updates_during_load.append((kind, key, value))
+        # Otherwise the state is not read yet, and the wallet already holds the change.
+
+        await self.agent.send_admin_message(
+            Message({
+                '@type': Admin.STATE_UPDATE,
+                'kind': kind,
+                'key': key,
+                'value': value
+            })
+        )
+
+
 class Admin(Module):
     FAMILY_NAME = "admin"
     VERSION = "1.0"
@@ -16,39 +132,54 @@ class Admin(Module):
 
     STATE = FAMILY + "/state"
     STATE_REQUEST = FAMILY + "/state_request"
+    STATE_UPDATE = FAMILY + "/state_update"
+    USER_ERROR = FAMILY + "/user_error"
+
+    # Page size of the state sent without being requested, e.g. on connecting a wallet.
+    STATE_PAGE_SIZE = 100
 
     def __init__(self, agent):
         self.agent = agent
+        self.state = AdminState(agent)
         self.router = SimpleRouter()
-        self.router.register(self.STATE_REQUEST, self.state_request)
+        self.router.register(self.STATE_REQUEST, self.state_request, needs_wallet=False)
 
     async def route(self, msg: Message) -> None:
         return await self.router.route(msg)
 
-    async def state_request(self, _) -> None:
+    async def state_request(self, msg: Optional[Message]) -> None:
+        """ Send the state to the UI.
+
+        :param msg: Optionally asks for one page of the invitations and
+            pairwise connections:
+            {
+                '@type': Admin.STATE_REQUEST,
+                'offset': 0,  # optional, number of each to skip
+                'limit': 100,  # optional, maximum number of each to send
+            }
+            An offset or limit that is not a valid count is answered with a
+            user_error.
+        """
         print("Processing state_request")
 
+        offset = msg.get('offset', 0) if msg else 0
+        limit = msg.get('limit') if msg else self.STATE_PAGE_SIZE
+        if type(offset) is not int or offset < 0:
+            return await self.user_error(msg, 'invalid_offset', 'offset must be a non-negative integer')
+        if limit is not None and (type(limit) is not int or limit < 1):
+            return await self.user_error(msg, 'invalid_limit', 'limit must be a positive integer')
+
         if self.agent.initialized:
-            invitations = await get_wallet_records(self.agent.wallet_handle, "invitations")
+            await self.state.load()
 
-            # load up pairwise connections
-            pairwise_records = []
-            agent_pairwises_list_str = await pairwise.list_pairwise(self.agent.wallet_handle)
-            agent_pairwises_list = json.loads(agent_pairwises_list_str)
-            for agent_pairwise_str in agent_pairwises_list:
-                pairwise_record = json.loads(agent_pairwise_str)
-                pairwise_record['metadata'] = json.loads(pairwise_record['metadata'])
-                pairwise_records.append(pairwise_record)
+            content = self.state.page(offset, limit)
+            content['initialized'] = self.agent.initialized
+            content['agent_name'] = self.agent.owner
 
             await self.agent.send_admin_message(
                 Message({
                     '@type': self.STATE,
-                    'content': {
-                        'initialized': self.agent.initialized,
-                        'agent_name': self.agent.owner,
-                        'invitations': invitations,
-                        'pairwise_connections': pairwise_records,
-                    }
+                    'content': content
                 })
             )
         else:
@@ -61,6 +192,14 @@ class Admin(Module):
                     })
             )
 
+    async def user_error(self, msg: Message, error_code: str, message: str) -> None:
+        await self.agent.send_admin_message(Message({
+            '@type': self.USER_ERROR,
+            'error_code': error_code,
+            'message': message,
+            'thread': {'thid': msg.id}
+        }))
+
 
 @aiohttp_jinja2.template('index.html')
 async def root(request):
@@ -22,8 +22,8 @@ class AdminWalletConnection(Module):
     def __init__(self, agent):
         self.agent = agent
         self.router = SimpleRouter()
-        self.router.register(AdminWalletConnection.CONNECT, self.connect)
-        self.router.register(AdminWalletConnection.DISCONNECT, self.disconnect)
+        self.router.register(AdminWalletConnection.CONNECT, self.connect, needs_wallet=False)
+        self.router.register(AdminWalletConnection.DISCONNECT, self.disconnect, needs_wallet=False)
 
     async def route(self, msg: Message) -> None:
         """ Route a message to its registered callback
@@ -50,6 +50,7 @@ class AdminWalletConnection(Module):
         """ Disconnect from an existing wallet.
         """
         await self.agent.disconnect_wallet()
+        self.agent.modules[Admin.FAMILY].state.clear()
 
         # Prompt a STATE message.
         return await self.agent.modules[Admin.FAMILY].state_request(None)
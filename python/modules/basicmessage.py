@@ -6,11 +6,162 @@ import uuid
 
 from indy import non_secrets
 
-from indy_sdk_utils import get_wallet_records
+from cache import LRUCache
+from indy_sdk_utils import iter_wallet_records, register_wallet_cache
+from python_agent_utils.messages.fields import parse_iso_datetime
 from python_agent_utils.messages.message import Message
 from router.simple_router import SimpleRouter
 from . import Module
 
+# Messages are tagged with the UTC time they were stored at, in this format.
+# Its values sort in time order, so the wallet can filter on ranges of them.
+TIMESTAMP_FORMAT = '%Y-%m-%dT%H:%M:%S.%fZ'
+
+# When looking for the latest messages, the first window searched covers an
+# hour before the cursor and each further window four times the previous one.
+# After MAX_WINDOWS of them (about eight weeks) the rest of the history is
+# searched at once.
+FIRST_WINDOW = datetime.timedelta(hours=1)
+WINDOW_GROWTH = 4
+MAX_WINDOWS = 6
+
+# Timestamp given to old messages whose sent_time cannot be parsed.
+UNKNOWN_TIMESTAMP = '1970-01-01T00:00:00.000000Z'
+
+# (wallet handle, their DID) of the histories whose messages all have a
+# timestamp tag.
+TAGGED_HISTORIES = register_wallet_cache(LRUCache(maxsize=4096))
+
+
+def _timestamp(moment: datetime.datetime) -> str:
+    return moment.strftime(TIMESTAMP_FORMAT)
+
+
+async def store_message(wallet_handle: int, their_did: str, message: dict) -> dict:
+    """ Store a message exchanged with their_did in the wallet.
+
+    :param message: The from, sent_time and content of the message.
+    :return: The message, with the timestamp it was stored under added.
+    """
+    message = dict(message, timestamp=_timestamp(datetime.datetime.utcnow()))
+    await non_secrets.add_wallet_record(
+        wallet_handle,
+        'basicmessage',
+        uuid.uuid4().hex,
+        json.dumps(message),
+        json.dumps({
+            'their_did': their_did,
+            '~timestamp': message['timestamp']
+        })
+    )
+    return message
+
+
+def _is_timestamp(value) -> bool:
+    try:
+        datetime.datetime.strptime(value, TIMESTAMP_FORMAT)
+    except (ValueError, TypeError):
+        return False
+    return True
+
+
+def _timestamp_from_sent_time(sent_time) -> str:
+    try:
+        moment = parse_iso_datetime(sent_time)
+    except (ValueError, TypeError, OverflowError):
+        return UNKNOWN_TIMESTAMP
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return _timestamp(moment)
+
+
+async def tag_history(wallet_handle: int, their_did: str) -> None:
+    """ Give the messages exchanged with their_did that were stored before
+        timestamps were added a timestamp, taken from their sent_time, so that
+        time window searches find them. Done once per history.
+    """
+    if (wallet_handle, their_did) in TAGGED_HISTORIES:
+        return
+
+    untagged = json.dumps({
+        'their_did': their_did,
+        '$not': {'~timestamp': {'$like': '%'}}
+    })
+    # Collected first, as records updated during a search may be returned again.
+    messages = [
+        message async for message in iter_wallet_records(wallet_handle, 'basicmessage', untagged)
+    ]
+    for message in messages:
+        record_id = message.pop('_id')
+        message['timestamp'] = _timestamp_from_sent_time(message.get('sent_time'))
+        await non_secrets.update_wallet_record_value(
+            wallet_handle, 'basicmessage', record_id, json.dumps(message)
+        )
+        await non_secrets.update_wallet_record_tags(
+            wallet_handle, 'basicmessage', record_id,
+            json.dumps({'their_did': their_did, '~timestamp': message['timestamp']})
+        )
+    TAGGED_HISTORIES.put((wallet_handle, their_did), True)
+
+
+async def _search_messages(wallet_handle: int, their_did: str, before: str = None,
+                           after: str = None, since: str = None) -> list:
+    conditions = [{'their_did': their_did}]
+    if before:
+        conditions.append({'~timestamp': {'$lt': before}})
+    if after:
+        conditions.append({'~timestamp': {'$gt': after}})
+    if since:
+        conditions.append({'~timestamp': {'$gte': since}})
+
+    return [
+        message async for message in iter_wallet_records(
+            wallet_handle, 'basicmessage', json.dumps({'$and': conditions})
+        )
+    ]
+
+
+async def find_messages(wallet_handle: int, their_did: str, limit: int = None,
+                        before: str = None, after: str = None) -> list:
+    """ Find messages exchanged with their_did, newest first.
+
+        With a limit, time windows reaching further back from before are
+        searched one after the other until enough messages are found. Each
+        window is read in full, so a busy conversation costs about the
+        messages of the windows searched; a quiet one costs at most
+        MAX_WINDOWS + 1 searches, the last one over the rest of the history.
+
+    :param limit: Maximum number of messages to return, or None for all of them.
+    :param before: Only return messages with an earlier timestamp.
+    :param after: Only return messages with a later timestamp.
+    """
+    await tag_history(wallet_handle, their_did)
+    if limit is None:
+        messages = await _search_messages(wallet_handle, their_did, before, after)
+    else:
+        messages = []
+        upper = before
+        window = FIRST_WINDOW
+        windows = 0
+        while len(messages) < limit:
+            since = None
+            if windows < MAX_WINDOWS:
+                end = datetime.datetime.strptime(upper, TIMESTAMP_FORMAT) if upper \
+                    else datetime.datetime.utcnow()
+                since = _timestamp(end - window)
+                if after and since <= after:
+                    since = None
+
+            messages.extend(await _search_messages(wallet_handle, their_did, upper, after, since))
+            if since is None:
+                break
+            upper = since
+            window *= WINDOW_GROWTH
+            windows += 1
+
+    messages.sort(key=lambda m: m['timestamp'], reverse=True)
+    return messages[:limit]
+
 
 class AdminBasicMessage(Module):
     """ Class handling messages received from the UI.
@@ -24,6 +175,7 @@ class AdminBasicMessage(Module):
     MESSAGE_SENT = FAMILY + "/message_sent"
     GET_MESSAGES = FAMILY + "/get_messages"
     MESSAGES = FAMILY + "/messages"
+    USER_ERROR = FAMILY + "/user_error"
 
     def __init__(self, agent):
         self.agent = agent
@@ -53,18 +205,14 @@ class AdminBasicMessage(Module):
         sent_time = datetime.datetime.utcnow().replace(tzinfo=datetime.timezone.utc).isoformat(' ')
 
         # Store message in the wallet
-        await non_secrets.add_wallet_record(
+        stored = await store_message(
             self.agent.wallet_handle,
-            'basicmessage',
-            uuid.uuid4().hex,
-            json.dumps({
+            their_did_str,
+            {
                 'from': my_did_str,
                 'sent_time': sent_time,
                 'content': message_to_send
-            }),
-            json.dumps({
-                'their_did': their_did_str
-            })
+            }
         )
 
         message = Message({
@@ -81,11 +229,7 @@ class AdminBasicMessage(Module):
                 '@type': AdminBasicMessage.MESSAGE_SENT,
                 'id': self.agent.ui_token,
                 'with': their_did_str,
-                'message': {
-                    'from': my_did_str,
-                    'sent_time': sent_time,
-                    'content': message_to_send
-                }
+                'message': stored
             })
         )
 
@@ -97,22 +241,56 @@ class AdminBasicMessage(Module):
                 '@type': AdminBasicMessage.GET_MESSAGES,
                 'with': 'CzznW3pTbFr2YqDCGWWf8x',  # DID of other party with whom messages
                                                    # have been exchanged
+                'limit': 50,  # optional, maximum number of messages to return
+                'before': '2019-05-27T08:34:25.105373Z',  # optional, only return messages
+                                                          # with an earlier timestamp
+                'after': '2019-05-20T10:02:11.000000Z',  # optional, only return messages
+                                                         # with a later timestamp
             }
+            Messages are returned newest first. Pass the timestamp of the last
+            message returned as before to get the next page. A request with an
+            invalid limit, before or after is answered with a user_error.
         :return: None
         """
         their_did = msg['with']
-        messages = await get_wallet_records(self.agent.wallet_handle, 'basicmessage',
-                                            json.dumps({'their_did': their_did}))
-        messages = sorted(messages, key=lambda n: n['sent_time'], reverse=True)
+        limit = msg.get('limit')
+        if limit is not None and (type(limit) is not int or limit < 1):
+            return await self.user_error(msg, 'invalid_limit', 'limit must be a positive integer')
+        for bound in ('before', 'after'):
+            if msg.get(bound) is not None and not _is_timestamp(msg[bound]):
+                return await self.user_error(
+                    msg, 'invalid_timestamp',
+                    '{} must be a timestamp formatted like {}'.format(bound, UNKNOWN_TIMESTAMP)
+                )
+
+        # One more than asked for tells whether there is another page.
+        messages = await find_messages(
+            self.agent.wallet_handle,
+            their_did,
+            limit=limit + 1 if limit is not None else None,
+            before=msg.get('before'),
+            after=msg.get('after')
+        )
 
         await self.agent.send_admin_message(
             Message({
                 '@type': AdminBasicMessage.MESSAGES,
                 'with': their_did,
-                'messages': messages
+                'before': msg.get('before'),
+                'after': msg.get('after'),
+                'has_more': limit is not None and len(messages) > limit,
+                'messages': messages[:limit]
             })
         )
 
+    async def user_error(self, msg: Message, error_code: str, message: str) -> None:
+        await self.agent.send_admin_message(Message({
+            '@type': AdminBasicMessage.USER_ERROR,
+            'error_code': error_code,
+            'message': message,
+            'thread': {'thid': msg.id}
+        }))
+
 
 class BasicMessage(Module):
     """ Class handling messages received from another Indy agent.
@@ -150,18 +328,14 @@ class BasicMessage(Module):
             return
 
         # Store message in the wallet
-        await non_secrets.add_wallet_record(
+        stored = await store_message(
             self.agent.wallet_handle,
-            'basicmessage',
-            uuid.uuid4().hex,
-            json.dumps({
+            msg.context['from_did'],
+            {
                 'from': msg.context['from_did'],
                 'sent_time': msg['sent_time'],
                 'content': msg['content']
-            }),
-            json.dumps({
-                'their_did': msg.context['from_did']
-            })
+            }
         )
 
         await self.agent.send_admin_message(
@@ -169,10 +343,6 @@ class BasicMessage(Module):
                 '@type': AdminBasicMessage.MESSAGE_RECEIVED,
                 'id': self.agent.ui_token,
                 'with': msg.context['from_did'],
-                'message': {
-                    'from': msg.context['from_did'],
-                    'sent_time': msg['sent_time'],
-                    'content': msg['content']
-                }
+                'message': stored
             })
         )
@@ -17,6 +17,7 @@ from python_agent_utils.messages.message import Message
 from router.simple_router import SimpleRouter
 from serializer.json_serializer import JSONSerializer as Serializer
 from . import Module
+from .admin import Admin
 
 
 # TODO: Move all string literal in a place which can be accessed by the test suite as well
@@ -179,9 +180,13 @@ class AdminConnection(Module):
             self.agent.wallet_handle,
             'invitations',
             invite_msg['recipientKeys'][0],
-            Serializer.serialize(pending_connection).decode('utf-8'),
+            Serializer.serialize_to_str(pending_connection),
             '{}'
         )
+        await self.agent.modules[Admin.FAMILY].state.put_invitation(
+            invite_msg['recipientKeys'][0],
+            pending_connection
+        )
 
     async def send_request(self, msg: Message) -> None:
         """ Recall invite message from wallet and prepare and send request to the inviter.
@@ -273,9 +278,13 @@ class AdminConnection(Module):
         await non_secrets.update_wallet_record_value(self.agent.wallet_handle,
                                                      'invitations',
                                                      pending_connection['connection_key'],
-                                                     Serializer.serialize(pending_connection).decode('utf-8'))
+                                                     Serializer.serialize_to_str(pending_connection))
 
         await self.agent.send_admin_message(pending_connection)
+        await self.agent.modules[Admin.FAMILY].state.put_invitation(
+            pending_connection['connection_key'],
+            pending_connection
+        )
 
     async def send_response(self, msg: Message) -> None:
         """ Send response to request.
@@ -356,6 +365,9 @@ class AdminConnection(Module):
         await non_secrets.delete_wallet_record(self.agent.wallet_handle,
                                                'invitations',
                                                pairwise_meta['connection_key'])
+        await self.agent.modules[Admin.FAMILY].state.remove_invitation(
+            pairwise_meta['connection_key']
+        )
 
 
 class Connection(Module):
@@ -445,19 +457,21 @@ class Connection(Module):
         (my_did, my_vk) = await utils.create_and_store_my_did(self.agent.wallet_handle)
 
         # Create pairwise relationship between my did and their did
-        await pairwise.create_pairwise(
+        pairwise_meta = {
+            'label': label,
+            'req_id': msg['@id'],
+            'their_endpoint': their_endpoint,
+            'their_vk': their_vk,
+            'my_vk': my_vk,
+            'connection_key': connection_key  # used to sign the response
+        }
+        await utils.create_pairwise(
             self.agent.wallet_handle,
             their_did,
             my_did,
-            json.dumps({
-                'label': label,
-                'req_id': msg['@id'],
-                'their_endpoint': their_endpoint,
-                'their_vk': their_vk,
-                'my_vk': my_vk,
-                'connection_key': connection_key  # used to sign the response
-            })
+            pairwise_meta
         )
+        await self.agent.modules[Admin.FAMILY].state.put_pairwise(their_did, my_did, pairwise_meta)
 
         pending_connection = Message({
             '@type': AdminConnection.REQUEST_RECEIVED,
@@ -476,7 +490,7 @@ class Connection(Module):
                 self.agent.wallet_handle,
                 'invitations',
                 connection_key,
-                Serializer.serialize(pending_connection).decode('utf-8'),
+                Serializer.serialize_to_str(pending_connection),
                 '{}'
             )
         except error.IndyError as indy_error:
@@ -484,6 +498,7 @@ class Connection(Module):
                 pass
             raise indy_error
         await self.agent.send_admin_message(pending_connection)
+        await self.agent.modules[Admin.FAMILY].state.put_invitation(connection_key, pending_connection)
 
     async def response_received(self, msg: Message) -> None:
         """ Process response
@@ -568,18 +583,20 @@ class Connection(Module):
         )
 
         # Create pairwise relationship between my did and their did
-        await pairwise.create_pairwise(
+        pairwise_meta = {
+            'label': label,
+            'their_endpoint': their_endpoint,
+            'their_vk': their_vk,
+            'my_vk': my_vk,
+            'connection_key': msg.data['connection~sig']['signer']
+        }
+        await utils.create_pairwise(
             self.agent.wallet_handle,
             their_did,
             my_did,
-            json.dumps({
-                'label': label,
-                'their_endpoint': their_endpoint,
-                'their_vk': their_vk,
-                'my_vk': my_vk,
-                'connection_key': msg.data['connection~sig']['signer']
-            })
+            pairwise_meta
         )
+        await self.agent.modules[Admin.FAMILY].state.put_pairwise(their_did, my_did, pairwise_meta)
 
         pending_connection = Serializer.deserialize(
             json.loads(
@@ -602,3 +619,6 @@ class Connection(Module):
         await non_secrets.delete_wallet_record(self.agent.wallet_handle,
                                                'invitations',
                                                msg.data['connection~sig']['signer'])
+        await self.agent.modules[Admin.FAMILY].state.remove_invitation(
+            msg.data['connection~sig']['signer']
+        )
@@ -9,7 +9,7 @@ import re
 import datetime
 from typing import Optional
 
-from indy import did, pairwise, non_secrets, error
+from indy import did, non_secrets, error
 
 import indy_sdk_utils as utils
 import serializer.json_serializer as Serializer
@@ -17,6 +17,7 @@ from python_agent_utils.messages.did_doc import DIDDoc
 from python_agent_utils.messages.connection import Connection as ConnectionMessage
 from router.simple_router import SimpleRouter
 from . import Module
+from .admin import Admin
 from python_agent_utils.messages.message import Message
 
 class AdminStaticConnection(Module):
@@ -88,18 +89,20 @@ class AdminStaticConnection(Module):
         (my_did, my_vk) = await utils.create_and_store_my_did(self.agent.wallet_handle)
 
         # Create pairwise relationship between my did and their did
-        await pairwise.create_pairwise(
+        pairwise_meta = {
+            'label': label,
+            'their_endpoint': their_endpoint,
+            'their_vk': their_vk,
+            'my_vk': my_vk,
+            'static': True
+        }
+        await utils.create_pairwise(
             self.agent.wallet_handle,
             their_did,
             my_did,
-            json.dumps({
-                'label': label,
-                'their_endpoint': their_endpoint,
-                'their_vk': their_vk,
-                'my_vk': my_vk,
-                'static': True
-            })
+            pairwise_meta
         )
+        await self.agent.modules[Admin.FAMILY].state.put_pairwise(their_did, my_did, pairwise_meta)
 
         await self.agent.send_admin_message(
             Message({
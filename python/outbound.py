@@ -0,0 +1,296 @@
+""" Outbound delivery of packed messages to other agents over HTTP.
+"""
+import asyncio
+import json
+import time
+from collections import deque, namedtuple
+from typing import Callable, List
+
+import aiohttp
+
+import metrics
+
+WIRE_HEADERS = {'content-type': 'application/ssi-agent-wire'}
+BATCH_HEADERS = {'content-type': 'application/json'}
+
+DELIVERED = metrics.counter(
+    'agent_outbound_delivered_total',
+    'Messages delivered to other agents.'
+)
+RETRIES = metrics.counter(
+    'agent_outbound_retries_total',
+    'Delivery attempts repeated after a failure.'
+)
+DEAD_LETTERS = metrics.counter(
+    'agent_outbound_dead_letters_total',
+    'Messages given up on and moved to the dead letter store.',
+    ['reason']
+)
+
+POST_SECONDS = metrics.histogram(
+    'agent_outbound_post_seconds',
+    'Time taken by HTTP POSTs delivering messages to other agents.',
+    ['route']
+)
+
+DeadLetter = namedtuple('DeadLetter', ['endpoint', 'wire_message', 'reason', 'time'])
+
+
+def is_retryable(status: int) -> bool:
+    return status == 429 or status >= 500
+
+
+class CircuitBreaker:
+    """ Track consecutive delivery failures to an endpoint.
+
+        After failure_threshold failures in a row the circuit opens and no
+        delivery is attempted for reset_timeout seconds. The next attempt after
+        that closes the circuit on success or opens it again on failure.
+    """
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+
+    @property
+    def open(self) -> bool:
+        return self.opened_at is not None and \
+            time.monotonic() - self.opened_at < self.reset_timeout
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self):
+        self.failures += 1
+        if self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+
+class OutboundDispatcher:
+    """ Deliver packed messages in the background through one queue per endpoint.
+
+        Messages sent to the same endpoint within batch_window seconds of each
+        other are posted together to the endpoint's batch route (the endpoint
+        URL followed by /batch). Endpoints without a batch route are
+        remembered and receive one POST per message instead. Messages to one
+        endpoint are delivered in the order they were sent.
+
+        Failed deliveries are retried with exponential backoff, up to
+        max_retries times. Each endpoint has a CircuitBreaker; while it is open,
+        messages to the endpoint are not attempted. At most max_queue_size
+        messages wait for each endpoint. Messages that cannot be delivered end
+        up in dead_letters.
+    """
+    def __init__(self, get_session: Callable[[], aiohttp.ClientSession],
+                 batch_window: float = 0.005, max_batch_size: int = 100,
+                 idle_timeout: float = 60, max_retries: int = 5,
+                 retry_backoff: float = 0.5, max_backoff: float = 30,
+                 failure_threshold: int = 5, reset_timeout: float = 30,
+                 max_queue_size: int = 1000, max_dead_letters: int = 1000):
+        self.get_session = get_session
+        self.batch_window = batch_window
+        self.max_batch_size = max_batch_size
+        self.idle_timeout = idle_timeout
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.max_backoff = max_backoff
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_queue_size = max_queue_size
+        self.queues = {}
+        self.tasks = {}
+        self.breakers = {}
+        self.batch_support = {}
+        self.dead_letters = deque(maxlen=max_dead_letters)
+
+    def send(self, endpoint: str, wire_message: bytes) -> None:
+        """ Queue wire_message for delivery to endpoint and return immediately.
+        """
+        if self._breaker_for(endpoint).open:
+            self._dead_letter(endpoint, [wire_message], 'circuit_open')
+            return
+        try:
+            self._queue_for(endpoint).put_nowait(wire_message)
+        except asyncio.QueueFull:
+            self._dead_letter(endpoint, [wire_message], 'queue_full')
+
+    async def stop(self):
+        """ Cancel all delivery tasks.
+        """
+        tasks = list(self.tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _breaker_for(self, endpoint: str) -> CircuitBreaker:
+        if endpoint not in self.breakers:
+            self.breakers[endpoint] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+        return self.breakers[endpoint]
+
+    def _queue_for(self, endpoint: str) -> asyncio.Queue:
+        if endpoint not in self.queues:
+            self.queues[endpoint] = asyncio.Queue(self.max_queue_size)
+            self.tasks[endpoint] = asyncio.get_event_loop().create_task(
+                self._delivery_loop(endpoint)
+            )
+        return self.queues[endpoint]
+
+    def _dead_letter(self, endpoint: str, wire_messages: List[bytes], reason: str):
+        print('Giving up delivering {} message(s) to {}: {}'.format(
+            len(wire_messages), endpoint, reason))
+        now = time.time()
+        for wire_message in wire_messages:
+            self.dead_letters.append(DeadLetter(endpoint, wire_message, reason, now))
+        DEAD_LETTERS.inc(len(wire_messages), reason=reason)
+
+    async def _delivery_loop(self, endpoint: str):
+        queue = self.queues[endpoint]
+        try:
+            while True:
+                try:
+                    first = await asyncio.wait_for(queue.get(), self.idle_timeout)
+                except asyncio.TimeoutError:
+                    if queue.empty():
+                        return
+                    continue
+
+                batch = [first]
+                if self.batch_window and self.batch_support.get(endpoint) is True:
+                    # Give closely following messages a chance to join the
+                    # batch. Until the endpoint is known to accept batches, only
+                    # messages that are already queued are batched together.
+                    await asyncio.sleep(self.batch_window)
+                while len(batch) < self.max_batch_size and not queue.empty():
+                    batch.append(queue.get_nowait())
+
+                try:
+                    await self._deliver_with_retries(endpoint, batch)
+                except Exception as e:
+                    print('Unexpected error delivering to {}: {}'.format(endpoint, e))
+                    self._dead_letter(endpoint, batch, 'error')
+        finally:
+            del self.queues[endpoint]
+            del self.tasks[endpoint]
+            self.batch_support.pop(endpoint, None)
+            breaker = self.breakers.get(endpoint)
+            if breaker and not breaker.failures:
+                del self.breakers[endpoint]
+
+    async def _deliver_with_retries(self, endpoint: str, batch: List[bytes]):
+        breaker = self._breaker_for(endpoint)
+        attempt = 0
+        while batch:
+            if breaker.open:
+                self._dead_letter(endpoint, batch, 'circuit_open')
+                return
+
+            failed = await self._deliver(endpoint, batch)
+            if len(failed) < len(batch):
+                breaker.record_success()
+            else:
+                breaker.record_failure()
+            if not failed:
+                return
+
+            attempt += 1
+            if attempt > self.max_retries:
+                self._dead_letter(endpoint, failed, 'max_retries')
+                return
+            RETRIES.inc(len(failed))
+            await asyncio.sleep(min(self.retry_backoff * 2 ** (attempt - 1), self.max_backoff))
+            batch = failed
+
+    async def _deliver(self, endpoint: str, batch: List[bytes]) -> List[bytes]:
+        """ Attempt delivery of batch.
+
+            :return: Messages that failed and should be retried, in order.
+        """
+        if len(batch) > 1 and self.batch_support.get(endpoint, True):
+            failed = await self._post_batch(endpoint, batch)
+            if failed is not None:
+                return failed
+
+        for i, wire_message in enumerate(batch):
+            try:
+                status = await self._post(endpoint, wire_message)
+            except Exception as e:
+                print('Failed to deliver message to {}: {}'.format(endpoint, e))
+                # Keep later messages behind this one to preserve their order.
+                return batch[i:]
+            if is_retryable(status):
+                return batch[i:]
+            if status not in (200, 202):
+                self._dead_letter(endpoint, [wire_message], 'status {}'.format(status))
+            else:
+                DELIVERED.inc()
+        return []
+
+    async def _post(self, endpoint: str, wire_message: bytes) -> int:
+        session = self.get_session()
+        with POST_SECONDS.time(route='single'):
+            async with session.post(endpoint, data=wire_message, headers=WIRE_HEADERS) as resp:
+                if resp.status != 202:
+                    print(resp.status)
+                    print(await resp.text())
+                return resp.status
+
+    async def _post_batch(self, endpoint: str, batch: List[bytes]):
+        """ Post batch to the batch route of endpoint.
+
+            Batching counts as supported only when the endpoint answers 200
+            with one result per message. Any other answer could come from an
+            endpoint accepting whatever is posted, so the endpoint is sent one
+            message per POST from then on.
+
+            :return: Messages to retry, or None if the messages still need to
+                be sent one by one.
+        """
+        batch_endpoint = endpoint.rstrip('/') + '/batch'
+        # The batch route expects a JSON array of the wire messages as posted.
+        body = b'[' + b','.join(batch) + b']'
+        session = self.get_session()
+        try:
+            with POST_SECONDS.time(route='batch'):
+                async with session.post(batch_endpoint, data=body, headers=BATCH_HEADERS) as resp:
+                    status = resp.status
+                    text = await resp.text()
+        except Exception as e:
+            print('Failed to deliver batch to {}: {}'.format(endpoint, e))
+            return batch
+
+        if is_retryable(status):
+            # Says nothing about batch support; this attempt goes one by one.
+            return None
+
+        results = _batch_results(text, len(batch)) if status == 200 else None
+        if results is None:
+            print('{} does not accept batches (status {})'.format(batch_endpoint, status))
+            self.batch_support[endpoint] = False
+            return None
+        self.batch_support[endpoint] = True
+
+        failed = []
+        for wire_message, status in zip(batch, results):
+            if status == 202:
+                DELIVERED.inc()
+            elif is_retryable(status):
+                failed.append(wire_message)
+            else:
+                self._dead_letter(endpoint, [wire_message], 'status {}'.format(status))
+        return failed
+
+
+def _batch_results(text: str, count: int):
+    """ Per message statuses of a batch response, or None if text is not a
+        batch response for count messages.
+    """
+    try:
+        results = json.loads(text)['results']
+        statuses = [result['status'] for result in results]
+    except (ValueError, KeyError, TypeError):
+        return None
+    if len(statuses) != count or not all(isinstance(status, int) for status in statuses):
+        return None
+    return statuses
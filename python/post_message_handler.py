@@ -1,14 +1,31 @@
 """ Message receiver handlers. """
 
 # pylint: disable=import-error
+import asyncio
+import json
+
 from aiohttp import web
 
+import metrics
+
+REJECTED_MESSAGES = metrics.counter(
+    'agent_inbound_rejected_total',
+    'Inbound messages refused by the HTTP transport.',
+    ['reason']
+)
+
 
 class PostMessageHandler:
     """ Simple message queue interface for receiving messages.
+
+        Requests are refused with 503 and a Retry-After header while the queue
+        is full, and with 413 when the body is larger than max_body_size.
     """
-    def __init__(self, queue):
+    def __init__(self, queue, max_body_size=1024 ** 2, retry_after=1, max_batch_size=100):
         self.msg_queue = queue
+        self.max_body_size = max_body_size
+        self.retry_after = retry_after
+        self.max_batch_size = max_batch_size
 
     async def handle_message(self, request):
         """ Put to message queue and return 202 to client.
@@ -16,6 +33,103 @@ class PostMessageHandler:
         if not request.app['agent'].initialized:
             raise web.HTTPUnauthorized()
 
-        msg = await request.read()
-        await self.msg_queue.put(msg)
+        if self.msg_queue.full():
+            self._reject_queue_full()
+
+        if request.content_length is not None and request.content_length > self.max_body_size:
+            self._reject_too_large(request.content_length)
+
+        msg = await self._read_body(request, self.max_body_size)
+
+        try:
+            self.msg_queue.put_nowait(msg)
+        except asyncio.QueueFull:
+            self._reject_queue_full()
         raise web.HTTPAccepted()
+
+    async def handle_batch(self, request):
+        """ Put each message of a JSON array to the message queue.
+
+            Each item of the array is a wire message, given either as a JSON
+            object or as a string. The response lists, in order, whether each
+            item was queued:
+
+                {
+                    "results": [
+                        {"status": 202},
+                        {"status": 503, "error": "queue_full"}
+                    ]
+                }
+        """
+        if not request.app['agent'].initialized:
+            raise web.HTTPUnauthorized()
+
+        if self.msg_queue.full():
+            self._reject_queue_full()
+
+        max_size = self.max_body_size * self.max_batch_size
+        if request.content_length is not None and request.content_length > max_size:
+            self._reject_too_large(request.content_length, max_size)
+
+        body = await self._read_body(request, max_size)
+        try:
+            batch = json.loads(body)
+        except ValueError:
+            raise web.HTTPBadRequest(reason='Batch must be a JSON array')
+        if not isinstance(batch, list):
+            raise web.HTTPBadRequest(reason='Batch must be a JSON array')
+        if len(batch) > self.max_batch_size:
+            raise web.HTTPBadRequest(
+                reason='Batch holds more than {} messages'.format(self.max_batch_size)
+            )
+
+        results = []
+        for item in batch:
+            if isinstance(item, dict):
+                msg = json.dumps(item).encode('utf-8')
+            elif isinstance(item, str):
+                msg = item.encode('utf-8')
+            else:
+                results.append({'status': 400, 'error': 'invalid_message'})
+                continue
+
+            if len(msg) > self.max_body_size:
+                REJECTED_MESSAGES.inc(reason='too_large')
+                results.append({'status': 413, 'error': 'too_large'})
+                continue
+
+            try:
+                self.msg_queue.put_nowait(msg)
+                results.append({'status': 202})
+            except asyncio.QueueFull:
+                REJECTED_MESSAGES.inc(reason='queue_full')
+                results.append({'status': 503, 'error': 'queue_full'})
+
+        headers = {}
+        if any(result['status'] == 503 for result in results):
+            headers['Retry-After'] = str(self.retry_after)
+        return web.json_response({'results': results}, headers=headers)
+
+    async def _read_body(self, request, max_size: int) -> bytes:
+        """ Read the request body, refusing it as soon as it exceeds max_size,
+            whether or not its length was announced.
+        """
+        body = bytearray()
+        while True:
+            chunk = await request.content.read(max_size + 1 - len(body))
+            if not chunk:
+                return bytes(body)
+            body.extend(chunk)
+            if len(body) > max_size:
+                self._reject_too_large(len(body), max_size)
+
+    def _reject_queue_full(self):
+        REJECTED_MESSAGES.inc(reason='queue_full')
+        raise web.HTTPServiceUnavailable(headers={'Retry-After': str(self.retry_after)})
+
+    def _reject_too_large(self, size, max_size=None):
+        REJECTED_MESSAGES.inc(reason='too_large')
+        raise web.HTTPRequestEntityTooLarge(
+            max_size=max_size or self.max_body_size,
+            actual_size=size
+        )
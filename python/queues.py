@@ -0,0 +1,93 @@
+""" Queues used to pass messages between the transports and the agent.
+"""
+import asyncio
+import time
+from typing import List, Sequence, Tuple
+
+import metrics
+
+QUEUE_DEPTH = metrics.gauge(
+    'agent_queue_depth',
+    'Number of messages waiting in a queue.',
+    ['queue']
+)
+QUEUE_WAIT = metrics.histogram(
+    'agent_queue_wait_seconds',
+    'Time messages spent waiting in a queue.',
+    ['queue']
+)
+
+
+class MeteredQueue(asyncio.Queue):
+    """ asyncio.Queue recording its depth and how long items wait in it.
+    """
+    def __init__(self, name: str, maxsize: int = 0, **kwargs):
+        super().__init__(maxsize, **kwargs)
+        self.name = name
+        QUEUE_DEPTH.set(0, queue=name)
+
+    def put_nowait(self, item):
+        super().put_nowait((time.monotonic(), item))
+        QUEUE_DEPTH.set(self.qsize(), queue=self.name)
+
+    def get_nowait(self):
+        enqueued_at, item = super().get_nowait()
+        QUEUE_DEPTH.set(self.qsize(), queue=self.name)
+        QUEUE_WAIT.observe(time.monotonic() - enqueued_at, queue=self.name)
+        return item
+
+
+class WeightedScheduler:
+    """ Take messages from several queues, favouring some over others.
+
+        Each round takes up to weight messages from every queue in turn, so
+        with weights 10 and 1 the first queue gets ten times the share of the
+        second while both are busy. A queue that is empty gives its share to
+        the others.
+    """
+    def __init__(self, queues_and_weights: Sequence[Tuple[asyncio.Queue, int]]):
+        for _, weight in queues_and_weights:
+            if weight < 1:
+                raise ValueError('queue weights must be at least 1')
+        self.queues = list(queues_and_weights)
+
+    async def get_batch(self, max_items: int) -> List[Tuple[asyncio.Queue, object]]:
+        """ Wait for messages and return up to max_items of them, each with
+            the queue it came from.
+
+            Messages already waiting are taken without waiting. Messages of
+            one queue stay in order.
+        """
+        batch = self._take(max_items)
+        if not batch:
+            batch = await self._wait()
+            batch += self._take(max_items - len(batch))
+        return batch
+
+    def _take(self, max_items: int):
+        batch = []
+        while len(batch) < max_items:
+            taken = len(batch)
+            for queue, weight in self.queues:
+                for _ in range(min(weight, max_items - len(batch))):
+                    if queue.empty():
+                        break
+                    batch.append((queue, queue.get_nowait()))
+            if len(batch) == taken:
+                break
+        return batch
+
+    async def _wait(self):
+        # Wait on every queue at once; a cancelled get leaves its item queued.
+        loop = asyncio.get_event_loop()
+        getters = [(queue, loop.create_task(queue.get())) for queue, _ in self.queues]
+        try:
+            await asyncio.wait([getter for _, getter in getters], return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for _, getter in getters:
+                if not getter.done():
+                    getter.cancel()
+        return [
+            (queue, getter.result()) for queue, getter in getters
+            if getter.done() and not getter.cancelled()
+        ]
@@ -2,10 +2,17 @@
     A base router is provided to show the basic interface of routers.
 """
 
+from collections import namedtuple
 from typing import Callable
 from python_agent_utils.messages.message import Message
 
 
+# A registered handler and how it may be run:
+#   needs_wallet: the handler uses the wallet, so it cannot run before one is opened.
+#   concurrent: the handler may run alongside other messages from the same sender.
+Route = namedtuple('Route', ['handler', 'needs_wallet', 'concurrent'])
+
+
 class BaseRouter:
     """ Router Base Class. Provide basic interface for additional routers.
     """
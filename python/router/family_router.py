@@ -2,41 +2,98 @@
 """
 
 import re
+from functools import lru_cache
+from typing import Optional
+
+import metrics
 from modules import Module
 from python_agent_utils.messages.message import Message
-from . import BaseRouter, RouteAlreadyRegisteredException, UnparsableMessageFamilyException
+from . import BaseRouter, Route, RouteAlreadyRegisteredException, \
+    UnparsableMessageFamilyException
+
+FAMILY_PATTERN = re.compile(r"(.+/.+/\d+.\d+).+")
+
+# Registered message types are far shorter than this. Longer @type values can
+# only be unroutable, and are parsed without taking a slot in the family cache.
+MAX_CACHED_TYPE_LENGTH = 256
+
+UNROUTABLE_MESSAGES = metrics.counter(
+    'agent_unroutable_messages_total',
+    'Messages whose family has no registered module.'
+)
 
 
 class FamilyRouter(BaseRouter):
     """ Simple router for handling Indy Messages.
 
         Uses python dictionary to correlate a message family to a Module.
+        The routes of each module's SimpleRouter are also merged into one
+        table when the module is registered, so most messages go straight
+        to their handler with a single lookup.
     """
     def __init__(self):
         self.routes = {}
+        self.type_routes = {}
 
     def register(self, msg_family: str, module: Module) -> None:
         """ Register a callback for messages with a given type.
         """
-        if msg_family in self.routes.keys():
+        if msg_family in self.routes:
+            raise RouteAlreadyRegisteredException()
+
+        module_routes = getattr(getattr(module, 'router', None), 'routes', {})
+        if any(msg_type in self.type_routes for msg_type in module_routes):
             raise RouteAlreadyRegisteredException()
 
         self.routes[msg_family] = module
+        self.type_routes.update(module_routes)
+
+    def lookup(self, msg_type: str) -> Optional[Route]:
+        """ Return the route registered for a message type, if any.
+        """
+        # Peers may send any JSON value as @type, unhashable ones included.
+        if not isinstance(msg_type, str):
+            return None
+        return self.type_routes.get(msg_type)
+
+    def family_label(self, msg_type) -> str:
+        """ Family of a message type for labelling metrics.
+
+            Only registered families are returned, 'unknown' otherwise, so that
+            other agents cannot add label values at will.
+        """
+        try:
+            family = FamilyRouter.family_from_type(msg_type)
+        except (UnparsableMessageFamilyException, TypeError):
+            return 'unknown'
+        return family if family in self.routes else 'unknown'
 
     async def route(self, msg: Message) -> None:
         """ Route a message to it's registered callback.
         """
-        family = FamilyRouter.family_from_type(msg.type)
-        if family in self.routes.keys():
-            module = self.routes[family]
-            return await module.route(msg)
-        else:
-            print("unknown message family: {}".format(family))
+        route = self.lookup(msg.type)
+        if route is not None:
+            return await route.handler(msg)
+
+        module = self.routes.get(FamilyRouter.family_from_type(msg.type))
+        if module is None:
+            UNROUTABLE_MESSAGES.inc()
+            return None
+        return await module.route(msg)
 
     @staticmethod
     def family_from_type(msg_type: str) -> str:
-        matches = re.match("(.+/.+/\d+.\d+).+", msg_type)
-        if not matches:
-            raise UnparsableMessageFamilyException()
+        if isinstance(msg_type, str) and len(msg_type) <= MAX_CACHED_TYPE_LENGTH:
+            return _cached_family_from_type(msg_type)
+        return _family_from_type(msg_type)
+
+
+def _family_from_type(msg_type: str) -> str:
+    matches = FAMILY_PATTERN.match(msg_type)
+    if not matches:
+        raise UnparsableMessageFamilyException()
+
+    return matches.group(1)
+
 
-        return matches.group(1)
+_cached_family_from_type = lru_cache(maxsize=1024)(_family_from_type)
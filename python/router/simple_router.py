@@ -3,7 +3,7 @@
 
 from typing import Callable, Coroutine
 from python_agent_utils.messages.message import Message
-from . import BaseRouter, RouteAlreadyRegisteredException
+from . import BaseRouter, Route, RouteAlreadyRegisteredException
 
 
 class SimpleRouter(BaseRouter):
@@ -15,16 +15,18 @@ class SimpleRouter(BaseRouter):
         self.routes = {}
 
     def register(self, msg_type: str,
-                 handler: Callable[[Message], Coroutine[any, any, None]]) -> None:
+                 handler: Callable[[Message], Coroutine[any, any, None]],
+                 needs_wallet: bool = True, concurrent: bool = False) -> None:
         """ Register a callback for messages with a given type.
         """
-        if msg_type in self.routes.keys():
+        if msg_type in self.routes:
             raise RouteAlreadyRegisteredException()
 
-        self.routes[msg_type] = handler
+        self.routes[msg_type] = Route(handler, needs_wallet, concurrent)
 
     async def route(self, msg: Message) -> None:
         """ Route a message to it's registered callback.
         """
-        if msg.type in self.routes.keys():
-            return await self.routes[msg.type](msg)
+        route = self.routes.get(msg.type)
+        if route is not None:
+            return await route.handler(msg)
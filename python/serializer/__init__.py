@@ -28,3 +28,12 @@ class BaseSerializer:
         raise NotImplementedError("Pack method in serializer module \
             is not implemented. Use the methods contained in a submodule of \
             serializer, such as json_serializer.")
+
+    @staticmethod
+    def serialize_to_str(msg: Message) -> str:  #pylint: disable=unused-argument
+        """ Serialize to str.
+        """
+
+        raise NotImplementedError("Pack method in serializer module \
+            is not implemented. Use the methods contained in a submodule of \
+            serializer, such as json_serializer.")
@@ -1,9 +1,12 @@
 """
 Serializer using json as i/o format.
-"""
 
-import json
+The JSON library used is the backend selected in python_agent_utils.json_backend.
+"""
 
+from python_agent_utils.json_backend import (  # pylint: disable=unused-import
+    BACKENDS, JSONBackend, register_backend, select_backend, selected_backend
+)
 from python_agent_utils.messages.message import Message
 from . import BaseSerializer
 
@@ -11,17 +14,31 @@ from . import BaseSerializer
 class JSONSerializer(BaseSerializer):
     """ Serializer using json as i/o format.
     """
+    backend = staticmethod(selected_backend)
+    select_backend = staticmethod(select_backend)
+
     @staticmethod
     def deserialize(dump: bytes) -> Message:
         """ Deserialize from json string to Message, if it looks like a Message.
             Returns a dictionary otherwise.
         """
 
-        return Message(json.loads(dump))
+        return Message(JSONSerializer.backend().loads(dump))
 
     @staticmethod
     def serialize(msg: Message) -> bytes:
         """ Serialize from Message to json string or from dictionary to json string.
         """
 
-        return msg.as_json().encode('utf-8')
+        return JSONSerializer.backend().dumps_bytes(
+            msg.to_dict() if isinstance(msg, Message) else msg
+        )
+
+    @staticmethod
+    def serialize_to_str(msg: Message) -> str:
+        """ Serialize as serialize does, but to a str rather than bytes.
+        """
+
+        return JSONSerializer.backend().dumps(
+            msg.to_dict() if isinstance(msg, Message) else msg
+        )
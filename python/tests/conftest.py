@@ -0,0 +1,14 @@
+""" Unit tests of the agent modules that do not need libindy.
+
+    Run from the python directory:
+
+        python -m pytest tests
+"""
+import os
+import sys
+
+PYTHON_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The agent modules, and python_agent_utils next to them.
+sys.path.insert(0, PYTHON_DIR)
+sys.path.insert(1, os.path.dirname(PYTHON_DIR))
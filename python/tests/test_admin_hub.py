@@ -0,0 +1,93 @@
+import json
+
+import pytest
+
+from admin_hub import AdminHub
+
+
+def entries(client):
+    return [json.loads(entry) for entry in client.buffer]
+
+
+@pytest.mark.asyncio
+async def test_every_client_receives_every_message():
+    hub = AdminHub()
+    first, second = hub.connect(), hub.connect()
+    hub.publish('{"n": 1}')
+
+    for client in (first, second):
+        frame = json.loads(await hub.next_frame(client))
+        assert frame == {'epoch': hub.epoch, 'seq': 1, 'msg': {'n': 1}}
+
+
+@pytest.mark.asyncio
+async def test_waiting_messages_are_sent_as_one_array_frame():
+    hub = AdminHub(max_batch_size=2)
+    client = hub.connect()
+    for n in range(3):
+        hub.publish(json.dumps({'n': n}))
+
+    first = json.loads(await hub.next_frame(client))
+    second = json.loads(await hub.next_frame(client))
+    assert [entry['msg']['n'] for entry in first] == [0, 1]
+    assert second['msg'] == {'n': 2}
+
+
+@pytest.mark.asyncio
+async def test_client_falling_behind_is_lagging():
+    hub = AdminHub(client_buffer_size=2)
+    client = hub.connect()
+    for n in range(3):
+        hub.publish(json.dumps({'n': n}))
+
+    assert client.lagging
+    assert await hub.next_frame(client) is None
+
+
+def test_reconnecting_client_is_replayed_missed_messages():
+    hub = AdminHub(client_buffer_size=5)
+    for n in range(3):
+        hub.publish(json.dumps({'n': n}))
+
+    client = hub.connect(since=1, epoch=hub.epoch)
+    assert [entry['seq'] for entry in entries(client)] == [2, 3]
+    assert [entry['msg']['n'] for entry in entries(client)] == [1, 2]
+    assert not entries(hub.connect(since=3, epoch=hub.epoch))
+
+
+def test_new_client_is_replayed_nothing():
+    hub = AdminHub()
+    hub.publish('{}')
+
+    assert not entries(hub.connect())
+
+
+@pytest.mark.parametrize('since', [1, 9])
+def test_client_missing_discarded_messages_is_reset(since):
+    hub = AdminHub(client_buffer_size=3)
+    for n in range(5):
+        hub.publish(json.dumps({'n': n}))
+
+    client = hub.connect(since=since, epoch=hub.epoch)
+    assert entries(client) == [{'epoch': hub.epoch, 'seq': 5, 'reset': True}]
+
+
+def test_client_from_another_epoch_is_reset():
+    restarted = AdminHub()
+    for n in range(5):
+        restarted.publish(json.dumps({'n': n}))
+
+    client = restarted.connect(since=2, epoch='before restart')
+    assert entries(client) == [{'epoch': restarted.epoch, 'seq': 5, 'reset': True}]
+
+
+@pytest.mark.asyncio
+async def test_frames_are_packed_when_pack_is_given():
+    async def pack(frame):
+        return 'packed ' + frame
+
+    hub = AdminHub(pack=pack)
+    client = hub.connect()
+    hub.publish('{}')
+
+    assert (await hub.next_frame(client)).startswith('packed {')
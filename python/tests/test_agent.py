@@ -0,0 +1,94 @@
+import json
+
+import pytest
+
+from agent import Agent, MESSAGE_FAILURES
+from python_agent_utils.messages.message import Message
+
+JWE = {'protected': 'p', 'iv': 'i', 'ciphertext': 'c', 'tag': 't'}
+
+
+def agent():
+    return Agent(hostname='localhost', port=8080)
+
+
+def failures(stage):
+    return MESSAGE_FAILURES.values.get((stage,), 0)
+
+
+@pytest.mark.parametrize('wire_msg', [
+    b'not json',
+    b'["a", "list"]',
+    b'{"neither": "a message nor packed"}',
+])
+@pytest.mark.asyncio
+async def test_unrecognized_wire_message_is_dropped(wire_msg):
+    before = failures('parse')
+
+    assert await agent().unpack_wire_msg(wire_msg) is None
+    assert failures('parse') == before + 1
+
+
+@pytest.mark.asyncio
+async def test_plaintext_message_is_not_unpacked():
+    msg = await agent().unpack_wire_msg(b'{"@type": "x/y/1.0/z", "content": "hi"}')
+
+    assert msg.type == 'x/y/1.0/z'
+    assert msg['content'] == 'hi'
+
+
+@pytest.mark.asyncio
+async def test_message_failing_to_unpack_is_dropped():
+    subject = agent()
+
+    async def unpack(wallet_handle, wire_message):
+        raise ValueError('cannot decrypt')
+
+    subject.crypto.unpack = unpack
+    before = failures('unpack')
+
+    assert await subject.unpack_wire_msg(json.dumps(JWE).encode('utf-8')) is None
+    assert failures('unpack') == before + 1
+
+
+def submitted(subject):
+    return [item for items in subject.worker_pool.pending.values() for item in items]
+
+
+@pytest.mark.asyncio
+async def test_message_with_a_type_that_is_not_a_string_is_still_handed_on():
+    subject = agent()
+    subject.message_queue.put_nowait(b'{"@type": ["x/y/1.0/z"]}')
+
+    await subject.handle_incoming()
+
+    assert [msg.type for msg in submitted(subject)] == [['x/y/1.0/z']]
+
+
+@pytest.mark.asyncio
+async def test_failing_message_does_not_stop_the_others():
+    subject = agent()
+    ordering_key = subject.ordering_key
+
+    def failing_ordering_key(msg, from_admin=False):
+        if msg['n'] == 1:
+            raise RuntimeError('no key')
+        return ordering_key(msg, from_admin)
+
+    async def unpack_wire_msg(wire_msg):
+        if wire_msg == b'unpackable':
+            raise RuntimeError('cannot unpack')
+        return Message(json.loads(wire_msg.decode('utf-8')))
+
+    subject.ordering_key = failing_ordering_key
+    subject.unpack_wire_msg = unpack_wire_msg
+    for wire_msg in (b'{"@type": "x/y/1.0/z", "n": 0}', b'unpackable',
+                     b'{"@type": "x/y/1.0/z", "n": 1}', b'{"@type": "x/y/1.0/z", "n": 2}'):
+        subject.message_queue.put_nowait(wire_msg)
+    unpack_failures, handle_failures = failures('unpack'), failures('handle')
+
+    await subject.handle_incoming()
+
+    assert sorted(msg['n'] for msg in submitted(subject)) == [0, 2]
+    assert failures('unpack') == unpack_failures + 1
+    assert failures('handle') == handle_failures + 1
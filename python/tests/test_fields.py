@@ -0,0 +1,34 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from python_agent_utils.messages.fields import parse_iso_datetime
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('2019-05-27T08:34:25Z', datetime(2019, 5, 27, 8, 34, 25, tzinfo=timezone.utc)),
+    ('2019-05-27 08:34:25.105373+00:00',
+     datetime(2019, 5, 27, 8, 34, 25, 105373, tzinfo=timezone.utc)),
+    ('2019-05-27T08:34:25.1-02:30',
+     datetime(2019, 5, 27, 8, 34, 25, 100000, tzinfo=timezone(-timedelta(hours=2, minutes=30)))),
+    ('2019-05-27T08:34:25', datetime(2019, 5, 27, 8, 34, 25)),
+])
+def test_common_forms_are_parsed(value, expected):
+    parsed = parse_iso_datetime(value)
+    assert parsed == expected
+    assert parsed.utcoffset() == expected.utcoffset()
+
+
+def test_other_iso_forms_fall_back_to_dateutil():
+    assert parse_iso_datetime('20190527T083425Z') == \
+        datetime(2019, 5, 27, 8, 34, 25, tzinfo=timezone.utc)
+
+
+@pytest.mark.parametrize('value', [
+    '2019-05-27T08:34:25Z\n',
+    '2019-13-27T08:34:25Z',
+    'yesterday',
+])
+def test_invalid_values_are_rejected(value):
+    with pytest.raises(ValueError):
+        parse_iso_datetime(value)
@@ -0,0 +1,45 @@
+import json
+
+import pytest
+
+from python_agent_utils import json_backend
+from python_agent_utils.messages.connection import Connection
+from serializer.json_serializer import BACKENDS, JSONBackend, JSONSerializer, register_backend
+
+
+@pytest.fixture
+def recording_backend():
+    calls = []
+
+    def record(name, function):
+        def recorded(obj):
+            calls.append(name)
+            return function(obj)
+        return recorded
+
+    register_backend(JSONBackend(
+        'recording',
+        record('dumps', json.dumps),
+        record('dumps_bytes', lambda obj: json.dumps(obj).encode('utf-8')),
+        record('loads', json.loads)
+    ))
+    selected = json_backend.selected_backend()
+    yield calls
+    json_backend.select_backend(selected.name)
+    del BACKENDS['recording']
+
+
+def test_backend_selected_through_the_agent_serializer_is_used_everywhere(recording_backend):
+    JSONSerializer.select_backend('recording')
+
+    invite = Connection.Invite.build('Alice', 'key', 'http://agent.example/indy')
+    label = Connection.Invite.parse(invite)['label']
+    JSONSerializer.deserialize(JSONSerializer.serialize({'label': label}))
+
+    assert label == 'Alice'
+    assert recording_backend == ['dumps', 'loads', 'dumps_bytes', 'loads']
+
+
+def test_unknown_backend_is_refused():
+    with pytest.raises(ValueError):
+        JSONSerializer.select_backend('no-such-backend')
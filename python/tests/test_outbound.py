@@ -0,0 +1,232 @@
+import asyncio
+import json
+
+import pytest
+
+from outbound import CircuitBreaker, OutboundDispatcher
+
+ENDPOINT = 'http://agent.example/indy'
+
+
+class FakeResponse:
+    def __init__(self, status, text=''):
+        self.status = status
+        self._text = text
+
+    async def text(self):
+        return self._text
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+
+class FakeSession:
+    """ Answers each POST with respond(url, data), recording the posts made.
+    """
+    def __init__(self, respond):
+        self.respond = respond
+        self.posts = []
+
+    def post(self, url, data, headers):
+        self.posts.append((url, data))
+        return FakeResponse(*self.respond(url, data))
+
+
+def dispatcher(session, **kwargs):
+    kwargs.setdefault('retry_backoff', 0.001)
+    return OutboundDispatcher(lambda: session, **kwargs)
+
+
+async def until(condition, timeout=1):
+    for _ in range(int(timeout / 0.005)):
+        if condition():
+            return
+        await asyncio.sleep(0.005)
+    raise AssertionError('condition not met in time')
+
+
+@pytest.mark.asyncio
+async def test_failing_delivery_is_retried_then_dead_lettered():
+    session = FakeSession(lambda url, data: (500,))
+    outbound = dispatcher(session, max_retries=2)
+    outbound.send(ENDPOINT, b'{"id": 1}')
+
+    await until(lambda: outbound.dead_letters)
+    await outbound.stop()
+
+    assert len(session.posts) == 3
+    assert outbound.dead_letters[0].reason == 'max_retries'
+    assert outbound.dead_letters[0].wire_message == b'{"id": 1}'
+
+
+@pytest.mark.asyncio
+async def test_client_error_is_dead_lettered_without_retry():
+    session = FakeSession(lambda url, data: (400,))
+    outbound = dispatcher(session)
+    outbound.send(ENDPOINT, b'{"id": 1}')
+
+    await until(lambda: outbound.dead_letters)
+    await outbound.stop()
+
+    assert len(session.posts) == 1
+    assert outbound.dead_letters[0].reason == 'status 400'
+
+
+@pytest.mark.asyncio
+async def test_retry_succeeds_after_transient_failure():
+    statuses = [503, 202]
+    session = FakeSession(lambda url, data: (statuses.pop(0),))
+    outbound = dispatcher(session)
+    outbound.send(ENDPOINT, b'{"id": 1}')
+
+    await until(lambda: not statuses)
+    await outbound.stop()
+
+    assert len(session.posts) == 2
+    assert not outbound.dead_letters
+
+
+def test_breaker_opens_after_threshold_and_half_opens_after_timeout():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    breaker.record_failure()
+    assert not breaker.open
+    breaker.record_failure()
+    assert breaker.open
+
+    breaker.opened_at -= 0.05
+    assert not breaker.open  # half-open: the next attempt is let through
+    breaker.record_failure()
+    assert breaker.open
+
+    breaker.opened_at -= 0.05
+    breaker.record_success()
+    assert not breaker.open
+    assert breaker.failures == 0
+
+
+@pytest.mark.asyncio
+async def test_messages_to_open_circuit_are_dead_lettered():
+    session = FakeSession(lambda url, data: (202,))
+    outbound = dispatcher(session)
+    breaker = outbound._breaker_for(ENDPOINT)
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+
+    outbound.send(ENDPOINT, b'{"id": 1}')
+    await outbound.stop()
+
+    assert not session.posts
+    assert outbound.dead_letters[0].reason == 'circuit_open'
+
+
+def batch_results(url, data, status=202):
+    if url.endswith('/batch'):
+        count = len(json.loads(data.decode()))
+        return 200, json.dumps({'results': [{'status': status}] * count})
+    return 202,
+
+
+@pytest.mark.asyncio
+async def test_messages_sent_together_are_posted_as_one_batch():
+    session = FakeSession(batch_results)
+    outbound = dispatcher(session, batch_window=0.01)
+    for i in range(3):
+        outbound.send(ENDPOINT, '{{"id": {}}}'.format(i).encode())
+
+    await until(lambda: session.posts)
+    assert outbound.batch_support[ENDPOINT] is True
+    await outbound.stop()
+
+    assert [url for url, _ in session.posts] == [ENDPOINT + '/batch']
+    assert json.loads(session.posts[0][1].decode()) == [{'id': 0}, {'id': 1}, {'id': 2}]
+
+
+@pytest.mark.parametrize('response', [
+    (202, ''),
+    (404, 'not found'),
+    (200, 'OK'),
+    (200, json.dumps({'results': [{'status': 202}]})),
+])
+@pytest.mark.asyncio
+async def test_batch_falls_back_to_single_posts_on_unexpected_answer(response):
+    def respond(url, data):
+        return response if url.endswith('/batch') else (202,)
+
+    session = FakeSession(respond)
+    outbound = dispatcher(session, batch_window=0.01)
+    for i in range(3):
+        outbound.send(ENDPOINT, '{{"id": {}}}'.format(i).encode())
+
+    await until(lambda: len(session.posts) == 4)
+    assert outbound.batch_support[ENDPOINT] is False
+    await outbound.stop()
+
+    assert [url for url, _ in session.posts] == [ENDPOINT + '/batch'] + [ENDPOINT] * 3
+    assert [data for _, data in session.posts[1:]] == [b'{"id": 0}', b'{"id": 1}', b'{"id": 2}']
+    assert not outbound.dead_letters
+
+
+@pytest.mark.asyncio
+async def test_only_failed_messages_of_a_batch_are_retried():
+    attempts = []
+
+    def respond(url, data):
+        batch = json.loads(data.decode())
+        attempts.append(batch)
+        if len(attempts) == 1:
+            return 200, json.dumps({'results': [{'status': 202}, {'status': 503}]})
+        return 202,
+
+    session = FakeSession(respond)
+    outbound = dispatcher(session, batch_window=0.01)
+    outbound.send(ENDPOINT, b'{"id": 0}')
+    outbound.send(ENDPOINT, b'{"id": 1}')
+
+    await until(lambda: len(attempts) == 2)
+    await outbound.stop()
+
+    assert attempts == [[{'id': 0}, {'id': 1}], {'id': 1}]
+
+
+@pytest.mark.asyncio
+async def test_lone_message_is_not_held_back_until_batches_are_known_to_work():
+    session = FakeSession(batch_results)
+    outbound = dispatcher(session, batch_window=10)
+    outbound.send(ENDPOINT, b'{"id": 0}')
+
+    await until(lambda: session.posts)
+    await outbound.stop()
+
+    assert session.posts == [(ENDPOINT, b'{"id": 0}')]
+
+
+@pytest.mark.asyncio
+async def test_messages_beyond_queue_size_are_dead_lettered():
+    session = FakeSession(batch_results)
+    outbound = dispatcher(session, max_queue_size=2)
+    for i in range(3):
+        outbound.send(ENDPOINT, '{{"id": {}}}'.format(i).encode())
+
+    assert [(d.wire_message, d.reason) for d in outbound.dead_letters] == [
+        (b'{"id": 2}', 'queue_full')
+    ]
+    await until(lambda: session.posts)
+    await outbound.stop()
+
+
+@pytest.mark.asyncio
+async def test_idle_endpoint_state_is_forgotten():
+    session = FakeSession(batch_results)
+    outbound = dispatcher(session, idle_timeout=0.01)
+    outbound.send(ENDPOINT, b'{"id": 0}')
+    outbound.send(ENDPOINT, b'{"id": 1}')
+
+    await until(lambda: session.posts)
+    await until(lambda: not outbound.tasks)
+
+    assert not outbound.queues
+    assert not outbound.breakers
+    assert not outbound.batch_support
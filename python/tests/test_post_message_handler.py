@@ -0,0 +1,125 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+from aiohttp import web
+
+from post_message_handler import PostMessageHandler
+
+
+class FakeContent:
+    """ Hands out the body a few bytes at a time, as a slow client would.
+    """
+    def __init__(self, body, chunk_size=4):
+        self.body = body
+        self.chunk_size = chunk_size
+
+    async def read(self, n=-1):
+        size = self.chunk_size if n < 0 else min(n, self.chunk_size)
+        chunk, self.body = self.body[:size], self.body[size:]
+        return chunk
+
+
+class FakeRequest:
+    def __init__(self, body, content_length=None, initialized=True):
+        self.app = {'agent': SimpleNamespace(initialized=initialized)}
+        self.content = FakeContent(body)
+        self.content_length = content_length
+
+
+@pytest.mark.asyncio
+async def test_message_is_queued_and_accepted():
+    queue = asyncio.Queue(1)
+    handler = PostMessageHandler(queue)
+
+    with pytest.raises(web.HTTPAccepted):
+        await handler.handle_message(FakeRequest(b'{"id": 1}'))
+
+    assert queue.get_nowait() == b'{"id": 1}'
+
+
+@pytest.mark.asyncio
+async def test_message_is_refused_with_retry_after_while_queue_is_full():
+    queue = asyncio.Queue(1)
+    queue.put_nowait(b'{}')
+    handler = PostMessageHandler(queue, retry_after=3)
+
+    with pytest.raises(web.HTTPServiceUnavailable) as refused:
+        await handler.handle_message(FakeRequest(b'{"id": 1}'))
+
+    assert refused.value.headers['Retry-After'] == '3'
+    assert queue.qsize() == 1
+
+
+@pytest.mark.asyncio
+async def test_message_announced_larger_than_max_body_size_is_refused():
+    queue = asyncio.Queue(1)
+    handler = PostMessageHandler(queue, max_body_size=8)
+
+    with pytest.raises(web.HTTPRequestEntityTooLarge):
+        await handler.handle_message(FakeRequest(b'{"id": 1000}', content_length=12))
+
+    assert queue.empty()
+
+
+@pytest.mark.asyncio
+async def test_message_is_refused_before_the_agent_is_initialized():
+    queue = asyncio.Queue(1)
+    handler = PostMessageHandler(queue)
+
+    with pytest.raises(web.HTTPUnauthorized):
+        await handler.handle_message(FakeRequest(b'{"id": 1}', initialized=False))
+
+    assert queue.empty()
+
+
+@pytest.mark.asyncio
+async def test_unannounced_body_is_refused_once_it_exceeds_max_body_size():
+    queue = asyncio.Queue(1)
+    handler = PostMessageHandler(queue, max_body_size=8)
+    request = FakeRequest(b'{"id": 1000}' + b' ' * 1000)
+
+    with pytest.raises(web.HTTPRequestEntityTooLarge):
+        await handler.handle_message(request)
+
+    assert queue.empty()
+    # Reading stopped just past the limit.
+    assert len(request.content.body) > 1000
+
+
+@pytest.mark.asyncio
+async def test_batch_reports_the_outcome_of_each_message():
+    queue = asyncio.Queue(2)
+    handler = PostMessageHandler(queue, max_body_size=16, retry_after=2)
+    body = json.dumps([{'id': 1}, '{"id": 2}', 3, 'x' * 17, {'id': 4}]).encode('utf-8')
+
+    response = await handler.handle_batch(FakeRequest(body))
+
+    assert json.loads(response.body.decode('utf-8')) == {'results': [
+        {'status': 202},
+        {'status': 202},
+        {'status': 400, 'error': 'invalid_message'},
+        {'status': 413, 'error': 'too_large'},
+        {'status': 503, 'error': 'queue_full'},
+    ]}
+    assert response.headers['Retry-After'] == '2'
+    assert [queue.get_nowait() for _ in range(2)] == [b'{"id": 1}', b'{"id": 2}']
+
+
+@pytest.mark.parametrize('body', [b'{"id": 1}', b'not json', b'[1, 2, 3]'])
+@pytest.mark.asyncio
+async def test_batch_that_is_not_a_short_json_array_is_refused(body):
+    handler = PostMessageHandler(asyncio.Queue(10), max_batch_size=2)
+
+    with pytest.raises(web.HTTPBadRequest):
+        await handler.handle_batch(FakeRequest(body))
+
+
+@pytest.mark.asyncio
+async def test_batch_larger_than_its_messages_allow_is_refused():
+    handler = PostMessageHandler(asyncio.Queue(10), max_body_size=8, max_batch_size=2)
+    body = json.dumps(['x' * 8] * 2).encode('utf-8')
+
+    with pytest.raises(web.HTTPRequestEntityTooLarge):
+        await handler.handle_batch(FakeRequest(body))
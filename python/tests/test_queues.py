@@ -0,0 +1,57 @@
+import asyncio
+
+import pytest
+
+from queues import MeteredQueue, WeightedScheduler
+
+
+def taken(batch):
+    return [item for _, item in batch]
+
+
+@pytest.mark.asyncio
+async def test_queues_are_drained_by_weight():
+    admin = MeteredQueue('test_admin')
+    peer = MeteredQueue('test_peer')
+    for i in range(10):
+        peer.put_nowait('p{}'.format(i))
+    for i in range(5):
+        admin.put_nowait('a{}'.format(i))
+    scheduler = WeightedScheduler([(admin, 3), (peer, 1)])
+
+    assert taken(await scheduler.get_batch(8)) == ['a0', 'a1', 'a2', 'p0', 'a3', 'a4', 'p1', 'p2']
+    # An empty queue gives its share to the others.
+    assert taken(await scheduler.get_batch(8)) == ['p3', 'p4', 'p5', 'p6', 'p7', 'p8', 'p9']
+
+
+@pytest.mark.asyncio
+async def test_batch_records_the_queue_of_each_item():
+    admin = MeteredQueue('test_admin')
+    peer = MeteredQueue('test_peer')
+    admin.put_nowait('a')
+    peer.put_nowait('p')
+    scheduler = WeightedScheduler([(admin, 1), (peer, 1)])
+
+    assert await scheduler.get_batch(2) == [(admin, 'a'), (peer, 'p')]
+
+
+@pytest.mark.asyncio
+async def test_waits_for_an_item_on_any_queue_without_losing_others():
+    admin = MeteredQueue('test_admin')
+    peer = MeteredQueue('test_peer')
+    scheduler = WeightedScheduler([(admin, 10), (peer, 1)])
+
+    batch = asyncio.ensure_future(scheduler.get_batch(4))
+    await asyncio.sleep(0.01)
+    assert not batch.done()
+    peer.put_nowait('p0')
+
+    assert taken(await asyncio.wait_for(batch, 1)) == ['p0']
+    admin.put_nowait('a0')
+    assert taken(await scheduler.get_batch(4)) == ['a0']
+    assert admin.empty() and peer.empty()
+
+
+def test_weights_must_be_positive():
+    with pytest.raises(ValueError):
+        WeightedScheduler([(MeteredQueue('test_admin'), 0)])
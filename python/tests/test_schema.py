@@ -0,0 +1,45 @@
+from collections import OrderedDict
+
+import pytest
+
+from python_agent_utils.messages.fields import (
+    AnyField, ChooseField, IntegerField, IterableField, MapField, NonEmptyStringField, SchemaField
+)
+from python_agent_utils.messages.schema import compile_field
+
+FIELD = SchemaField({
+    'id': AnyField(),
+    'label': NonEmptyStringField(),
+    'count': IntegerField(optional=True, nullable=True),
+    'tags': IterableField(NonEmptyStringField(), min_length=1, max_length=2),
+    'extra': MapField(NonEmptyStringField(), ChooseField(['a', 'b']), optional=True),
+})
+
+VALID = {'id': None, 'label': 'x', 'tags': ['t']}
+
+
+@pytest.mark.parametrize('value', [
+    VALID,
+    OrderedDict(VALID),
+    dict(VALID, count=None, extra={'k': 'a'}),
+    dict(VALID, count=3),
+    {'label': 'x', 'tags': ['t']},
+    dict(VALID, label=''),
+    dict(VALID, label=1),
+    dict(VALID, count='3'),
+    dict(VALID, tags=[]),
+    dict(VALID, tags=['t', 't', 't']),
+    dict(VALID, tags=['t', '']),
+    dict(VALID, tags='t'),
+    dict(VALID, extra={'k': 'c'}),
+    dict(VALID, extra={'': 'a'}),
+    ['not', 'a', 'map'],
+    None,
+])
+def test_compiled_validator_agrees_with_field(value):
+    assert compile_field(FIELD)(value) == FIELD.validate(value)
+
+
+def test_nullable_fields_accept_none():
+    assert compile_field(SchemaField({}, nullable=True))(None) is None
+    assert compile_field(SchemaField({}))(None) is not None
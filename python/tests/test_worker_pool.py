@@ -0,0 +1,97 @@
+import asyncio
+import random
+
+import pytest
+
+from worker_pool import KeyedWorkerPool
+
+
+@pytest.mark.asyncio
+async def test_items_with_one_key_are_handled_in_order():
+    handled = []
+
+    async def handler(item):
+        await asyncio.sleep(random.random() / 1000)
+        handled.append(item)
+
+    pool = KeyedWorkerPool(handler, workers=4)
+    pool.start()
+    for i in range(20):
+        for key in 'abc':
+            await pool.submit(key, (key, i))
+    while pool.pending:
+        await asyncio.sleep(0.001)
+    await pool.stop()
+
+    for key in 'abc':
+        assert [i for k, i in handled if k == key] == list(range(20))
+
+
+@pytest.mark.asyncio
+async def test_items_with_different_keys_run_concurrently():
+    running = set()
+    overlapped = asyncio.Event()
+
+    async def handler(key):
+        running.add(key)
+        if len(running) > 1:
+            overlapped.set()
+        await overlapped.wait()
+
+    pool = KeyedWorkerPool(handler, workers=2)
+    pool.start()
+    await pool.submit('a', 'a')
+    await pool.submit('b', 'b')
+    await asyncio.wait_for(overlapped.wait(), 1)
+    await pool.stop()
+
+
+@pytest.mark.asyncio
+async def test_submit_waits_while_max_pending_items_are_held():
+    release = asyncio.Event()
+
+    async def handler(item):
+        await release.wait()
+
+    pool = KeyedWorkerPool(handler, workers=1, max_pending=2)
+    pool.start()
+    await pool.submit('a', 1)
+    await pool.submit('b', 2)
+    third = asyncio.ensure_future(pool.submit('c', 3))
+    await asyncio.sleep(0.01)
+    assert not third.done()
+
+    release.set()
+    await asyncio.wait_for(third, 1)
+    await pool.stop()
+
+
+@pytest.mark.asyncio
+async def test_failing_handler_releases_its_slot():
+    async def handler(item):
+        raise RuntimeError(item)
+
+    pool = KeyedWorkerPool(handler, workers=1, max_pending=1)
+    pool.start()
+    for i in range(3):
+        await asyncio.wait_for(pool.submit('a', i), 1)
+    await pool.stop()
+
+
+@pytest.mark.asyncio
+async def test_urgent_keys_are_taken_first():
+    handled = []
+
+    async def handler(item):
+        handled.append(item)
+
+    pool = KeyedWorkerPool(handler, workers=1)
+    await pool.submit('a', 1)
+    await pool.submit('b', 2)
+    await pool.submit('admin', 3, urgent=True)
+    pool.start()
+    while pool.pending:
+        await asyncio.sleep(0.001)
+    await pool.stop()
+
+    assert handled == [3, 1, 2]
@@ -11,9 +11,13 @@ const MESSAGE_TYPES = {
 
 const ADMIN = {
     STATE: MESSAGE_TYPES.ADMIN_BASE + "state",
-    STATE_REQUEST: MESSAGE_TYPES.ADMIN_BASE + "state_request"
+    STATE_REQUEST: MESSAGE_TYPES.ADMIN_BASE + "state_request",
+    STATE_UPDATE: MESSAGE_TYPES.ADMIN_BASE + "state_update"
 };
 
+// Number of invitations and pairwise connections requested at once.
+const STATE_PAGE_SIZE = 100;
+
 const ADMIN_WALLETCONNECTION = {
     CONNECT: MESSAGE_TYPES.ADMIN_WALLETCONNECTION_BASE + 'connect',
     DISCONNECT: MESSAGE_TYPES.ADMIN_WALLETCONNECTION_BASE + 'disconnect',
@@ -51,6 +55,9 @@ const ADMIN_BASICMESSAGE = {
     MESSAGES: MESSAGE_TYPES.ADMIN_BASICMESSAGE_BASE + "messages"
 };
 
+// Number of basic messages fetched at once when showing a connection.
+const MESSAGE_PAGE_SIZE = 50;
+
 const ADMIN_TRUSTPING = {
     SEND_TRUSTPING: MESSAGE_TYPES.ADMIN_TRUSTPING_BASE + "send_trustping",
     TRUSTPING_SENT: MESSAGE_TYPES.ADMIN_TRUSTPING_BASE + "trustping_sent",
@@ -70,25 +77,62 @@ window.indy_connector.ping();
 const agent_admin_key = document.head.querySelector("[name=agent_admin_key][content]").content;
 
 // Create WebSocket connection.
-const socket = new WebSocket('ws://' + window.location.hostname + ':' + window.location.port + '/ws');
+// Every message comes numbered; after losing the connection, the socket is
+// reopened asking for the messages sent since the last one seen. When those
+// are no longer kept, or the agent restarted and so changed epoch, the agent
+// sends a reset entry and the whole state is requested again.
+var socket = null;
+var last_epoch = null;
+var last_seq = null;
+
+function open_socket() {
+    var url = 'ws://' + window.location.hostname + ':' + window.location.port + '/ws';
+    if (last_seq !== null) {
+        url += '?epoch=' + encodeURIComponent(last_epoch) + '&since=' + last_seq;
+    }
+    socket = new WebSocket(url);
 
-// Connection opened
-socket.addEventListener('open', function(event) {
-    ui_agent.connect();
-});
+    // Connection opened
+    socket.addEventListener('open', function(event) {
+        if (last_seq === null) {
+            ui_agent.connect();
+        }
+    });
+
+    socket.addEventListener('close', function(event) {
+        console.log('websocket closed, reconnecting');
+        setTimeout(open_socket, 1000);
+    });
+
+    // Listen for messages
+    // With the extension, each frame is packed as a whole.
+    socket.addEventListener('message', function (event) {
+        if (indy_connector.extension_exists) {
+            console.log("attempting to unpack");
+            indy_connector.unpack_message(event.data);
+        } else {
+            handle_frame(JSON.parse(event.data));
+        }
+    });
+}
 
-// Listen for messages
-socket.addEventListener('message', function (event) {
-    if (indy_connector.extension_exists) {
-        console.log("attempting to unpack");
-        indy_connector.unpack_message(event.data);
-    } else {
-        console.log('Routing: ' + event.data);
-        msg = JSON.parse(event.data);
-        msg_router.route(msg);
-        thread_router.route(msg);
-    }
-});
+// Messages sent together arrive in one frame, as a JSON array.
+function handle_frame(frame) {
+    var entries = Array.isArray(frame) ? frame : [frame];
+    entries.forEach(function (entry) {
+        last_epoch = entry.epoch;
+        last_seq = entry.seq;
+        if (entry.reset) {
+            ui_agent.connect();
+            return;
+        }
+        console.log('Routing: ', entry.msg);
+        msg_router.route(entry.msg);
+        thread_router.route(entry.msg);
+    });
+}
+
+open_socket();
 
 
 function sendMessage(msg, thread_cb){
@@ -116,10 +160,7 @@ indy_connector.register_pack_cb(function(message) {
 });
 
 indy_connector.register_unpack_cb(function(result) {
-    console.log('Routing: ', result.message);
-    msg = JSON.parse(result.message);
-    msg_router.route(msg);
-    thread_router.route(msg);
+    handle_frame(JSON.parse(result.message));
 });
 
 // Message Router {{{
@@ -192,6 +233,7 @@ var ui_data = {
     connection: {},
     new_basicmessage: "",
     basicmessage_list: [],
+    basicmessage_has_more: false,
     new_query: "",
     history_view: []
 };
@@ -236,16 +278,6 @@ var ui_relationships = new Vue({
             document.getElementById('invite').select();
             console.log(document.execCommand('copy'));
         },
-        invite_received: function (msg) {
-            this.connections.push({
-                label: msg.label,
-                connection_key: msg.connection_key,
-                endpoint: msg.endpoint,
-                status: msg.status  ,
-                history: history_log_format(msg.history)
-            });
-        },
-
         receive_invite: function (c) {
             msg = {
                 '@type': ADMIN_CONNECTION.RECEIVE_INVITE,
@@ -261,19 +293,6 @@ var ui_relationships = new Vue({
             };
             sendMessage(msg);
         },
-        request_sent: function (msg) {
-            var c = this.get_connection_by_key(msg.connection_key);
-            c.status = msg.status;
-        },
-        request_received: function (msg) {
-            this.connections.push({
-                label: msg.label,
-                did: msg.did,
-                status: msg.status,
-                connection_key: msg.connection_key,
-                history: history_log_format(msg.history)
-            })
-        },
         send_response: function (c) {
             msg = {
                 '@type': ADMIN_CONNECTION.SEND_RESPONSE,
@@ -281,23 +300,21 @@ var ui_relationships = new Vue({
             };
             sendMessage(msg);
         },
-        response_sent: function (msg) {
-            // request a state update to see the new pairwise connection
-            // this.connections will be emptied at the same time
-            sendMessage({'@type': ADMIN.STATE_REQUEST});
-        },
-        response_received: function (msg) {
-            // request a state update to see the new pairwise connection
-            // this.connections will be emptied at the same time
-            sendMessage({'@type': ADMIN.STATE_REQUEST});
+        // Apply a change of invitation or pairwise connection sent by the agent.
+        state_update: function (msg) {
+            if (msg.kind === 'invitations') {
+                if (msg.value !== null) {
+                    msg.value.history = history_log_format(msg.value.history);
+                }
+                this.connections = upsert(this.connections, 'connection_key', msg.key, msg.value);
+            } else if (msg.kind === 'pairwise_connections') {
+                this.pairwise_connections = upsert(this.pairwise_connections, 'their_did', msg.key, msg.value);
+            }
         },
         message_sent: function (msg) {
             if(msg.with == this.connection.their_did){
                 //connection view currently open
-                sendMessage({
-                    '@type': ADMIN_BASICMESSAGE.GET_MESSAGES,
-                    with: msg.with
-                });
+                this.basicmessage_list.unshift(msg.message);
             } else {
                 //connection not currently open. set unread flag on connection details?
             }
@@ -305,16 +322,19 @@ var ui_relationships = new Vue({
         message_received: function (msg) {
             if(msg.with == this.connection.their_did){
                 //connection view currently open
-                sendMessage({
-                    '@type': ADMIN_BASICMESSAGE.GET_MESSAGES,
-                    with: msg.with
-                });
+                this.basicmessage_list.unshift(msg.message);
             } else {
                 //connection not currently open. set unread flag on connection details?
             }
         },
         messages: function(msg){
-            this.basicmessage_list = msg.messages;
+            if(msg.before){
+                // older page, requested by load_older_messages
+                this.basicmessage_list = this.basicmessage_list.concat(msg.messages);
+            } else {
+                this.basicmessage_list = msg.messages;
+            }
+            this.basicmessage_has_more = msg.has_more;
         },
         display_history: function(connection){
             this.history_view = connection.history;
@@ -376,7 +396,17 @@ var ui_connection = new Vue({
         load: function(){
             sendMessage({
                 '@type': ADMIN_BASICMESSAGE.GET_MESSAGES,
-                with: this.connection.their_did
+                with: this.connection.their_did,
+                limit: MESSAGE_PAGE_SIZE
+            });
+        },
+        load_older_messages: function(){
+            var oldest = this.basicmessage_list[this.basicmessage_list.length - 1];
+            sendMessage({
+                '@type': ADMIN_BASICMESSAGE.GET_MESSAGES,
+                with: this.connection.their_did,
+                limit: MESSAGE_PAGE_SIZE,
+                before: oldest.timestamp
             });
         },
         send_trustping: function(){
@@ -498,7 +528,7 @@ var ui_agent = new Vue({
             sendMessage(
                 {
                     '@type': ADMIN.STATE_REQUEST,
-                    content: null
+                    limit: STATE_PAGE_SIZE
                 }
             );
         },
@@ -513,14 +543,28 @@ var ui_agent = new Vue({
                 //load invitations
 
                 console.log('invitations', state.invitations);
+                // The state comes in pages; the first one replaces what is shown.
+                if (!state.offset) {
+                    this.connections = [];
+                    this.pairwise_connections = [];
+                }
                 // Load pending connections while beautifying history messages
-                this.connections = []
                 state.invitations.forEach((i) => {
                     i.history = history_log_format(i.history)
                     this.connections.push(i);
                 });
                 // Load pairwise connections
-                this.pairwise_connections = state['pairwise_connections'];
+                this.pairwise_connections = this.pairwise_connections.concat(state['pairwise_connections']);
+
+                var next_offset = state.offset + Math.max(state.invitations.length, state.pairwise_connections.length);
+                if (next_offset > state.offset &&
+                        (next_offset < state.invitations_total || next_offset < state.pairwise_connections_total)) {
+                    sendMessage({
+                        '@type': ADMIN.STATE_REQUEST,
+                        offset: next_offset,
+                        limit: STATE_PAGE_SIZE
+                    });
+                }
             }
         }
     }
@@ -532,13 +576,9 @@ var ui_agent = new Vue({
 // Message Routes {{{
 msg_router.register(ADMIN.STATE, ui_agent.update);
 msg_router.register(ADMIN_CONNECTION.INVITE_GENERATED, ui_relationships.invite_generated);
-msg_router.register(ADMIN_CONNECTION.INVITE_RECEIVED, ui_relationships.invite_received);
-msg_router.register(ADMIN_CONNECTION.REQUEST_SENT, ui_relationships.request_sent);
-msg_router.register(ADMIN_CONNECTION.RESPONSE_SENT, ui_relationships.response_sent);
+msg_router.register(ADMIN.STATE_UPDATE, ui_relationships.state_update);
 msg_router.register(ADMIN_STATICCONNECTION.STATIC_CONNECTION_CREATED, ui_relationships.show_new_connection);
 msg_router.register(ADMIN_BASICMESSAGE.MESSAGE_SENT, ui_relationships.message_sent);
-msg_router.register(ADMIN_CONNECTION.RESPONSE_RECEIVED, ui_relationships.response_received);
-msg_router.register(ADMIN_CONNECTION.REQUEST_RECEIVED, ui_relationships.request_received);
 msg_router.register(ADMIN_BASICMESSAGE.MESSAGE_RECEIVED, ui_relationships.message_received);
 msg_router.register(ADMIN_BASICMESSAGE.MESSAGES, ui_relationships.messages);
 msg_router.register(ADMIN_TRUSTPING.TRUSTPING_SENT, ui_connection.trustping_sent);
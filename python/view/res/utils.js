@@ -25,3 +25,24 @@ function getTodayDate() {
 
     return currentDate;
 }
+
+// Return list with the item whose key_name is key replaced by value, or
+// value appended if no item matches. A null value removes the item.
+function upsert(list, key_name, key, value) {
+    var found = false;
+    var result = [];
+    list.forEach((item) => {
+        if (item[key_name] === key) {
+            found = true;
+            if (value !== null) {
+                result.push(value);
+            }
+        } else {
+            result.push(item);
+        }
+    });
+    if (!found && value !== null) {
+        result.push(value);
+    }
+    return result;
+}
@@ -2,48 +2,67 @@ import asyncio
 import aiohttp
 from aiohttp import web
 
+from admin_hub import AdminHub
+
 
 class WebSocketMessageHandler:
-    def __init__(self, inbound_queue, outbound_queue):
+    """ Admin UI websockets. Any number of them can be connected; each
+        receives every admin message through the hub.
+    """
+    def __init__(self, inbound_queue, hub: AdminHub):
         self.recv_q = inbound_queue
-        self.send_q = outbound_queue
-        self.ws = None
+        self.hub = hub
 
     async def ws_handler(self, request):
 
-        self.ws = web.WebSocketResponse()
-        await self.ws.prepare(request)
-
-        _, unfinished = await asyncio.wait(
-            [
-                self._websocket_receive(),
-                self._websocket_send()
-            ],
-            return_when=asyncio.FIRST_COMPLETED
-        )
-        for task in unfinished:
-            task.cancel()
-
-        ws = self.ws
-        self.ws = None
+        # A reconnecting UI passes the epoch and number of the last message it saw.
+        try:
+            since = int(request.query['since'])
+        except (KeyError, ValueError):
+            since = None
+        epoch = request.query.get('epoch')
+
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        client = self.hub.connect(since, epoch)
+
+        try:
+            _, unfinished = await asyncio.wait(
+                [
+                    self._websocket_receive(ws),
+                    self._websocket_send(ws, client)
+                ],
+                return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in unfinished:
+                task.cancel()
+        finally:
+            self.hub.disconnect(client)
+
+        if not ws.closed:
+            await ws.close()
         return ws
 
-    async def _websocket_receive(self):
-        async for websocket_message in self.ws:
+    async def _websocket_receive(self, ws):
+        async for websocket_message in ws:
             if websocket_message.type == aiohttp.WSMsgType.TEXT:
                 if websocket_message.data == 'close':
-                    await self.ws.close()
+                    await ws.close()
                 else:
                     print('Received "{}"'.format(websocket_message.data))
                     await self.recv_q.put(websocket_message.data)
             elif websocket_message.type == aiohttp.WSMsgType.ERROR:
                 print('ws connection closed with exception %s' %
-                      self.ws.exception())
+                      ws.exception())
 
         print('websocket connection closed')
 
-    async def _websocket_send(self):
+    async def _websocket_send(self, ws, client):
         while True:
-            msg_to_send = await self.send_q.get()
-            print('Sending "{}"'.format(msg_to_send))
-            await self.ws.send_str(msg_to_send)
+            frame = await self.hub.next_frame(client)
+            if frame is None:
+                print('Closing websocket of admin client falling behind')
+                await ws.close(code=aiohttp.WSCloseCode.TRY_AGAIN_LATER, message=b'lagging')
+                return
+            print('Sending "{}"'.format(frame))
+            await ws.send_str(frame)
@@ -0,0 +1,83 @@
+""" Pool of worker tasks processing messages concurrently while preserving
+    per-key ordering.
+"""
+import asyncio
+import itertools
+import traceback
+from collections import deque
+from typing import Callable, Coroutine, Hashable
+
+
+class KeyedWorkerPool:
+    """ Run a handler over submitted items using a fixed number of worker tasks.
+
+        Items submitted with the same key are handled one at a time, in the order
+        they were submitted. Items with different keys are handled concurrently,
+        so a slow item only holds up later items sharing its key.
+
+        Keys submitted as urgent are picked up by the next free worker, ahead of
+        keys already waiting.
+
+        At most max_pending items are held, counting those being handled; submit
+        waits for room beyond that. A max_pending of 0 means no limit.
+    """
+    def __init__(self, handler: Callable[[object], Coroutine], workers: int = 1,
+                 max_pending: int = 0):
+        if workers < 1:
+            raise ValueError('workers must be at least 1')
+        self.handler = handler
+        self.worker_count = workers
+        self.capacity = asyncio.Semaphore(max_pending) if max_pending > 0 else None
+        self.pending = {}
+        # (0 for urgent keys or 1, submission number, key)
+        self.ready_keys = asyncio.PriorityQueue()
+        self.submissions = itertools.count()
+        self.tasks = []
+
+    def start(self):
+        """ Start the worker tasks on the current event loop.
+        """
+        loop = asyncio.get_event_loop()
+        self.tasks = [
+            loop.create_task(self._worker())
+            for _ in range(self.worker_count)
+        ]
+
+    async def stop(self):
+        """ Cancel the worker tasks.
+        """
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+
+    async def submit(self, key: Hashable, item, urgent: bool = False) -> None:
+        """ Queue item for handling after any earlier item with the same key,
+            first waiting for room if max_pending items are already held.
+        """
+        if self.capacity is not None:
+            await self.capacity.acquire()
+
+        if key in self.pending:
+            # A worker already owns this key and will pick the item up.
+            self.pending[key].append(item)
+            return
+
+        self.pending[key] = deque([item])
+        self.ready_keys.put_nowait((0 if urgent else 1, next(self.submissions), key))
+
+    async def _worker(self):
+        while True:
+            _, _, key = await self.ready_keys.get()
+            items = self.pending[key]
+            while items:
+                item = items.popleft()
+                try:
+                    await self.handler(item)
+                except Exception:
+                    print("\n\n--- Message Processing failed --- \n\n")
+                    traceback.print_exc()
+                finally:
+                    if self.capacity is not None:
+                        self.capacity.release()
+            del self.pending[key]
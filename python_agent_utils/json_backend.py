@@ -0,0 +1,102 @@
+""" The JSON library used to serialize messages.
+
+The backends are orjson or ujson when installed, the standard library json
+module otherwise. The selected backend is kept here, in a module both the agent
+and python_agent_utils import by the same name, so selecting one applies to
+every serializer.
+"""
+
+import json
+from collections import OrderedDict, UserDict
+from typing import Callable, Optional
+
+from python_agent_utils.messages.message import Message
+
+
+def _plain(obj):
+    """ Unwrap Message (and other UserDict) objects to their underlying dict.
+    """
+    if isinstance(obj, Message):
+        return obj.to_dict()
+    if isinstance(obj, UserDict):
+        return obj.data
+    raise TypeError('Object of type {} is not JSON serializable'.format(type(obj).__name__))
+
+
+class JSONBackend:
+    """ A JSON library able to serialize Message objects.
+
+        dumps returns str and dumps_bytes returns UTF-8 encoded bytes, so each
+        backend can produce either without a redundant encode or decode.
+    """
+    def __init__(self, name: str, dumps: Callable[[object], str],
+                 dumps_bytes: Callable[[object], bytes], loads: Callable[[object], object]):
+        self.name = name
+        self.dumps = dumps
+        self.dumps_bytes = dumps_bytes
+        self.loads = loads
+
+
+# Registered backends, fastest first.
+BACKENDS = OrderedDict()
+
+
+def register_backend(backend: JSONBackend) -> None:
+    BACKENDS[backend.name] = backend
+
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if orjson:
+    register_backend(JSONBackend(
+        'orjson',
+        lambda obj: orjson.dumps(obj, default=_plain).decode('utf-8'),
+        lambda obj: orjson.dumps(obj, default=_plain),
+        orjson.loads
+    ))
+
+try:
+    import ujson
+    # Older ujson releases do not accept a default function.
+    ujson.dumps(UserDict(), default=_plain)
+except (ImportError, TypeError):
+    ujson = None
+
+if ujson:
+    register_backend(JSONBackend(
+        'ujson',
+        lambda obj: ujson.dumps(obj, default=_plain, escape_forward_slashes=False),
+        lambda obj: ujson.dumps(
+            obj, default=_plain, escape_forward_slashes=False
+        ).encode('utf-8'),
+        ujson.loads
+    ))
+
+register_backend(JSONBackend(
+    'json',
+    lambda obj: json.dumps(obj, default=_plain),
+    lambda obj: json.dumps(obj, default=_plain).encode('utf-8'),
+    json.loads
+))
+
+_selected = next(iter(BACKENDS.values()))
+
+
+def select_backend(name: Optional[str] = None) -> JSONBackend:
+    """ Use the backend registered under name, or the fastest one available.
+    """
+    global _selected
+    if name is None:
+        name = next(iter(BACKENDS))
+    if name not in BACKENDS:
+        raise ValueError('JSON backend {} is not available; choose from {}'.format(
+            name, list(BACKENDS)))
+    _selected = BACKENDS[name]
+    return _selected
+
+
+def selected_backend() -> JSONBackend:
+    return _selected
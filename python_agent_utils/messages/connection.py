@@ -5,7 +5,9 @@ from typing import Optional
 
 from .message import Message
 from .did_doc import DIDDoc
-from python.serializer.json_serializer import JSONSerializer as Serializer
+from .fields import AnyField, ConstantField, SchemaField
+from .schema import compile_field
+from ..json_backend import selected_backend
 
 
 class Connection(Message):
@@ -33,9 +35,9 @@ class Connection(Message):
             matches = re.match('(.+)?c_i=(.+)', invite_url)
             assert matches, 'Improperly formatted invite url!'
 
-            invite_msg = Serializer.deserialize(
+            invite_msg = Message(selected_backend().loads(
                 base64.urlsafe_b64decode(matches.group(2)).decode('ascii')
-            )
+            ))
 
             invite_msg.check_for_attrs(
                 [
@@ -60,7 +62,7 @@ class Connection(Message):
 
             b64_invite = base64.urlsafe_b64encode(
                 bytes(
-                    Serializer.serialize(msg).decode('utf-8'),
+                    selected_backend().dumps(msg.to_dict()),
                     'ascii'
                 )
             ).decode('ascii')
@@ -106,24 +108,11 @@ class Connection(Message):
 
         @staticmethod
         def validate(request):
-            request.check_for_attrs(
-                [
-                    ('@type', Connection.REQUEST),
-                    '@id',
-                    'label',
-                    Connection.CONNECTION
-                ]
-            )
-
-            Message.check_for_attrs_in_message(
-                [
-                    DIDDoc.DID,
-                    DIDDoc.DID_DOC
-                ],
-                request[Connection.CONNECTION]
-            )
-
-            DIDDoc.validate(request[Connection.CONNECTION][DIDDoc.DID_DOC])
+            if isinstance(request, Message):
+                request = request.to_dict()
+            err = _validate_request(request)
+            if err:
+                raise ValueError(err)
 
     class Response:
         @staticmethod
@@ -218,3 +207,14 @@ class Connection(Message):
         their_vk = msg[Connection.CONNECTION][DIDDoc.DID_DOC]['publicKey'][0]['publicKeyBase58']
         their_endpoint = msg[Connection.CONNECTION][DIDDoc.DID_DOC]['service'][0]['serviceEndpoint']
         return their_did, their_vk, their_endpoint
+
+
+_validate_request = compile_field(SchemaField({
+    '@type': ConstantField(Connection.REQUEST),
+    '@id': AnyField(),
+    'label': AnyField(),
+    Connection.CONNECTION: SchemaField({
+        DIDDoc.DID: AnyField(),
+        DIDDoc.DID_DOC: DIDDoc.SCHEMA
+    })
+}))
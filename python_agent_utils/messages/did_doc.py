@@ -1,38 +1,31 @@
-from .message import Message
+from .fields import AnyField, ConstantField, IterableField, SchemaField
+from .schema import compile_field
 
 
 class DIDDoc:
     DID = 'did'
     DID_DOC = 'did_doc'
 
+    SCHEMA = SchemaField({
+        '@context': AnyField(),
+        'publicKey': IterableField(SchemaField({
+            'id': AnyField(),
+            'type': AnyField(),
+            'controller': AnyField(),
+            'publicKeyBase58': AnyField()
+        })),
+        'service': IterableField(SchemaField({
+            'type': ConstantField('IndyAgent'),
+            'recipientKeys': AnyField(),
+            'serviceEndpoint': AnyField()
+        }))
+    })
+
     @staticmethod
     def validate(did_doc):
-        Message.check_for_attrs_in_message(
-            [
-                '@context',
-                'publicKey',
-                'service'
-            ],
-            did_doc
-        )
+        err = _validate_did_doc(did_doc)
+        if err:
+            raise ValueError(err)
 
-        for publicKeyBlock in did_doc['publicKey']:
-            Message.check_for_attrs_in_message(
-                [
-                    'id',
-                    'type',
-                    'controller',
-                    'publicKeyBase58'
-                ],
-                publicKeyBlock
-            )
 
-        for serviceBlock in did_doc['service']:
-            Message.check_for_attrs_in_message(
-                [
-                    ('type', 'IndyAgent'),
-                    'recipientKeys',
-                    'serviceEndpoint'
-                ],
-                serviceBlock
-            )
+_validate_did_doc = compile_field(DIDDoc.SCHEMA)
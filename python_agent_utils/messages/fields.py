@@ -1,7 +1,11 @@
 import ipaddress
 import json
+import re
+from datetime import datetime, timedelta, timezone
 from abc import ABCMeta, abstractmethod
-from typing import Optional, Iterable
+from functools import lru_cache
+from collections.abc import Mapping
+from typing import Dict, Optional, Iterable
 
 import base58
 import dateutil.parser
@@ -70,10 +74,8 @@ class FieldBase(FieldValidator, metaclass=ABCMeta):
     def __type_check(self, val):
         if self._base_types is None:
             return  # type check is disabled
-        for t in self._base_types:
-            if isinstance(val, t):
-                return
-        return self._wrong_type_msg(val)
+        if not isinstance(val, self._base_types):
+            return self._wrong_type_msg(val)
 
     def _wrong_type_msg(self, val):
         types_str = ', '.join(map(lambda x: x.__name__, self._base_types))
@@ -245,6 +247,29 @@ class MapField(FieldBase):
                 return val_error
 
 
+class SchemaField(FieldBase):
+    """
+    A map with named members, each checked by its own field validator.
+    Members are required unless their validator is optional.
+    """
+    # dict first: it is what parsed JSON holds, and cheaper to check than an ABC
+    _base_types = (dict, Mapping)
+
+    def __init__(self, fields: Dict[str, FieldValidator], **kwargs):
+        super().__init__(**kwargs)
+        self.fields = fields
+
+    def _specific_validation(self, val):
+        for name, field in self.fields.items():
+            if name not in val:
+                if field.optional:
+                    continue
+                return 'Attribute "{}" is missing'.format(name)
+            err = field.validate(val[name])
+            if err:
+                return '{}: {}'.format(name, err)
+
+
 class AnyMapField(FieldBase):
     # A map where key and value can be of arbitrary types
     _base_types = (dict,)
@@ -311,22 +336,41 @@ class Base58Field(FieldBase):
 
     def __init__(self, byte_lengths: Optional[Iterable] = None, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.byte_lengths = byte_lengths
+        self.byte_lengths = tuple(byte_lengths) if byte_lengths is not None else None
 
     def _specific_validation(self, val):
-        invalid_chars = set(val) - self._alphabet
-        if invalid_chars:
-            # only 10 chars to shorten the output
-            # TODO: Why does it need to be sorted
-            to_print = sorted(invalid_chars)[:10]
-            return 'should not contain the following chars {}{}'.format(
-                to_print, ' (truncated)' if len(to_print) < len(invalid_chars) else '')
-        if self.byte_lengths is not None:
-            # TODO could impact performance, need to check
-            b58len = len(base58.b58decode(val))
-            if b58len not in self.byte_lengths:
-                return 'b58 decoded value length {} should be one of {}' \
-                    .format(b58len, list(self.byte_lengths))
+        return _validate_base58(val, self.byte_lengths)
+
+
+# Verkeys and DIDs recur in every message on a connection, so results are
+# memoized for all base58 validators, keyed by value and expected lengths.
+# An Ed25519 verkey is 44 base58 characters at most; anything much longer is
+# validated directly, so a peer cannot fill the memo with long values.
+MAX_MEMOIZED_BASE58_LENGTH = 64
+
+
+def _validate_base58(val: str, byte_lengths: Optional[tuple]) -> Optional[str]:
+    if len(val) <= MAX_MEMOIZED_BASE58_LENGTH:
+        return _memoized_validate_base58(val, byte_lengths)
+    return _check_base58(val, byte_lengths)
+
+
+def _check_base58(val: str, byte_lengths: Optional[tuple]) -> Optional[str]:
+    invalid_chars = set(val) - Base58Field._alphabet
+    if invalid_chars:
+        # only 10 chars to shorten the output
+        # TODO: Why does it need to be sorted
+        to_print = sorted(invalid_chars)[:10]
+        return 'should not contain the following chars {}{}'.format(
+            to_print, ' (truncated)' if len(to_print) < len(invalid_chars) else '')
+    if byte_lengths is not None:
+        b58len = len(base58.b58decode(val))
+        if b58len not in byte_lengths:
+            return 'b58 decoded value length {} should be one of {}' \
+                .format(b58len, list(byte_lengths))
+
+
+_memoized_validate_base58 = lru_cache(maxsize=4096)(_check_base58)
 
 
 class FullVerkeyField(FieldBase):
@@ -397,13 +441,67 @@ class TimestampField(FieldBase):
                 format(self._oldest_time, val)
 
 
+# The common ISO 8601 form, YYYY-MM-DD[T ]HH:MM:SS[.ffffff][Z|+HH:MM]. Python 3.6
+# has no datetime.fromisoformat, so it is matched here.
+_ISO_DATETIME = re.compile(
+    r'(\d{4})-(\d{2})-(\d{2})[T ](\d{2}):(\d{2}):(\d{2})(?:\.(\d{1,6}))?'
+    r'(?:(Z)|([+-])(\d{2}):(\d{2}))?\Z'
+)
+
+
+def parse_iso_datetime(val: str) -> datetime:
+    """
+    Parses an ISO 8601 date and time.
+
+    The common form is matched by a regular expression and built directly,
+    much faster than dateutil; whatever it does not match is left to dateutil.
+
+    :param val: ISO 8601 string
+    :return: parsed datetime
+    """
+    match = _ISO_DATETIME.match(val)
+    if match:
+        year, month, day, hour, minute, second, fraction, utc, sign, tz_hours, tz_minutes = \
+            match.groups()
+        tzinfo = None
+        if utc:
+            tzinfo = timezone.utc
+        elif sign:
+            offset = timedelta(hours=int(tz_hours), minutes=int(tz_minutes))
+            tzinfo = timezone(-offset if sign == '-' else offset)
+        try:
+            return datetime(
+                int(year), int(month), int(day), int(hour), int(minute), int(second),
+                int(fraction.ljust(6, '0')) if fraction else 0, tzinfo
+            )
+        except ValueError:
+            pass
+    return dateutil.parser.isoparse(val)
+
+
 class ISODatetimeStringField(FieldBase):
     _base_types = (str,)
-    parse_func = dateutil.parser.isoparse
+    parse_func = staticmethod(parse_iso_datetime)
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
 
+    def parse(self, val) -> datetime:
+        """
+        Validates the value and returns the datetime it holds, so values
+        that are also compared need not be parsed twice.
+
+        :param val: field value to parse
+        :return: parsed datetime
+        :raises ValueError: with the validation error
+        """
+        if not isinstance(val, str):
+            raise ValueError(self._wrong_type_msg(val))
+        try:
+            return self.parse_func(val)
+        except Exception:
+            raise ValueError("{} is an invalid ISO".format(val))
+
     def _specific_validation(self, val):
         try:
             self.parse_func(val)
@@ -487,11 +585,11 @@ class DIDField(FieldBase):
 
     _base_types = (str,)
     _valid_domains = ['sov', 'peer']
+    _validator = Base58Field(byte_lengths=(16,))
 
     def _specific_validation(self, val):
         did_parts = val.split(':')
         if len(did_parts) == 3 and did_parts[0] == 'did' and did_parts[1] in self._valid_domains:
-            validator = Base58Field(byte_lengths=(16,))
-            if not validator.validate(did_parts[2]):
+            if not self._validator.validate(did_parts[2]):
                 return None
         return 'Invalid DID {}'.format(val)
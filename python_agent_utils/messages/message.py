@@ -4,16 +4,24 @@
 import json
 import uuid
 from collections import UserDict
-from typing import Iterable
+from collections.abc import MutableMapping
+from typing import Iterable, Optional
 
 from python_agent_utils.messages.errors import ValidationException
-from python_agent_utils.messages.fields import NonNegativeNumberField, MapField, DIDField, \
-    ISODatetimeStringField
+from python_agent_utils.messages.fields import AnyField, NonNegativeNumberField, MapField, DIDField, \
+    ISODatetimeStringField, SchemaField
+from python_agent_utils.messages.schema import compile_field
 
 
-class Message(UserDict):
+class Message(MutableMapping):
     """ Data Model for messages.
+
+        Behaves as a mutable mapping over the `data` dictionary, so existing
+        msg['x'] style access keeps working. The @id is generated only when
+        first read, and context is created only when first used.
     """
+    __slots__ = ('data', '_context')
+
     ID = '@id'
     TYPE = '@type'
 
@@ -32,6 +40,7 @@ class Message(UserDict):
     EXPIRES_TIME = 'expires_time'
     DELAY_MILLI = 'delay_milli'
     WAIT_UNTIL_TIME = 'wait_until_time'
+    TIMING_TIMES = (IN_TIME, OUT_TIME, STALE_TIME, EXPIRES_TIME, WAIT_UNTIL_TIME)
 
     def __init__(self, *args, **kwargs):
         """ Create a Message object
@@ -42,34 +51,100 @@ class Message(UserDict):
         other things: ambiguous data. Interpretation defined by type and id.
 
         """
-        UserDict.__init__(self, *args, **kwargs)
-        self.context = {}
+        self.data = dict(*args, **kwargs)
+        self._context = None
+
+    def _ensure_id(self) -> dict:
         # Assign it an ID
-        if '@id' not in self.data:
-            self.data['@id'] = str(uuid.uuid4())
+        if Message.ID not in self.data:
+            self.data[Message.ID] = str(uuid.uuid4())
+        return self.data
+
+    def __getitem__(self, key):
+        if key == Message.ID:
+            self._ensure_id()
+        return self.data[key]
+
+    def __setitem__(self, key, value):
+        self.data[key] = value
+
+    def __delitem__(self, key):
+        del self.data[key]
+
+    def __contains__(self, key):
+        return key in self.data or key == Message.ID
+
+    def __iter__(self):
+        return iter(self._ensure_id())
+
+    def __len__(self):
+        return len(self._ensure_id())
+
+    def __repr__(self):
+        return repr(self._ensure_id())
+
+    def get(self, key, default=None):
+        if key == Message.ID:
+            return self.id
+        return self.data.get(key, default)
+
+    def copy(self):
+        msg = type(self)(self._ensure_id())
+        if self._context is not None:
+            msg.context = dict(self._context)
+        return msg
+
+    @property
+    def context(self) -> dict:
+        if self._context is None:
+            self._context = {}
+        return self._context
+
+    @context.setter
+    def context(self, value: dict):
+        self._context = value
 
     def to_dict(self):
-        return self.data
+        return self._ensure_id()
+
+    @property
+    def type(self) -> str:
+        return self.data[Message.TYPE]
+
+    @property
+    def id(self) -> str:
+        return self._ensure_id()[Message.ID]
 
     @property
-    def type(self):
-        return self.data["@type"]
+    def thread(self) -> Optional[dict]:
+        """ The ~thread decorator, or None if the message has none.
+        """
+        return self.data.get(Message.THREAD_DECORATOR)
 
     @property
-    def id(self):
-        return self.data["@id"]
+    def thread_id(self) -> Optional[str]:
+        thread = self.thread
+        return thread.get(Message.THREAD_ID) if thread else None
+
+    @property
+    def timing(self) -> Optional[dict]:
+        """ The ~timing decorator, or None if the message has none.
+        """
+        return self.data.get(Message.TIMING_DECORATOR)
 
-    class MessageEncoder(json.JSONEncoder):
-        def default(self, obj):
-            if isinstance(obj, Message):
-                return obj.to_dict()
-            return json.JSONEncoder.default(self, obj)
+    @staticmethod
+    def _json_default(obj):
+        if isinstance(obj, Message):
+            return obj.to_dict()
+        if isinstance(obj, UserDict):
+            return obj.data
+        raise TypeError('Object of type {} is not JSON serializable'.format(type(obj).__name__))
 
     def as_json(self):
-        return json.dumps(self, cls=Message.MessageEncoder)
+        return json.dumps(self.to_dict(), default=Message._json_default)
 
     def pretty_print(self):
-        return json.dumps(self, sort_keys=True, indent=2, cls=Message.MessageEncoder)
+        return json.dumps(self.to_dict(), sort_keys=True, indent=2, default=Message._json_default)
 
     def check_for_attrs(self, expected_attrs: Iterable):
         Message.check_for_attrs_in_message(expected_attrs, self)
@@ -112,10 +187,9 @@ class Message(UserDict):
     def _validate_thread_block(msg):
         if Message.THREAD_DECORATOR in msg:
             thread = msg[Message.THREAD_DECORATOR]
-            Message.check_for_attrs_in_message([
-                Message.THREAD_ID,
-                Message.SENDER_ORDER
-            ], thread)
+            err = _validate_thread(thread)
+            if err:
+                raise ValueError(err)
 
             thread_id = thread[Message.THREAD_ID]
             if msg.get(Message.ID) and thread_id == msg[Message.ID]:
@@ -123,46 +197,44 @@ class Message(UserDict):
             if thread.get(Message.PARENT_THREAD_ID) and thread[Message.PARENT_THREAD_ID] in (thread_id, msg[Message.ID]):
                 raise ValueError('Parent thread id {} must be different than thread id and outer id'.format(thread[Message.PARENT_THREAD_ID]))
 
-            # Creating objects has cost but since this codebase is meant to run only for test suite and possibly ref agent, its fine.
-            non_neg_num = NonNegativeNumberField()
-            err = non_neg_num.validate(thread[Message.SENDER_ORDER])
-            if not err:
-                if Message.RECEIVED_ORDERS in thread and thread[Message.RECEIVED_ORDERS]:
-                    recv_ords = thread[Message.RECEIVED_ORDERS]
-                    err = MapField(DIDField(), non_neg_num).validate(recv_ords)
-            if err:
-                raise ValueError(err)
-
     @staticmethod
     def _validate_timing_block(msg):
         if Message.TIMING_DECORATOR in msg:
             timing = msg[Message.TIMING_DECORATOR]
-            non_neg_num = NonNegativeNumberField()
-            iso_data = ISODatetimeStringField()
-            expected_iso_fields = [Message.IN_TIME, Message.OUT_TIME, Message.STALE_TIME,
-                                   Message.EXPIRES_TIME, Message.WAIT_UNTIL_TIME]
-            for f in expected_iso_fields:
+            # Each time is parsed once, and the result reused for the ordering checks.
+            times = {}
+            for f in Message.TIMING_TIMES:
                 if f in timing:
-                    err = iso_data.validate(timing[f])
-                    if err:
-                        raise ValueError(err)
-            if Message.DELAY_MILLI in timing:
-                err = non_neg_num.validate(timing[Message.DELAY_MILLI])
-                if err:
-                    raise ValueError(err)
+                    try:
+                        times[f] = _iso_datetime.parse(timing[f])
+                    except ValueError as e:
+                        raise ValueError('{}: {}'.format(f, e))
 
-            # In time cannot be greater than out time
-            if Message.IN_TIME in timing and Message.OUT_TIME in timing:
-                t_in = iso_data.parse_func(timing[Message.IN_TIME])
-                t_out = iso_data.parse_func(timing[Message.OUT_TIME])
+            err = _validate_delay(timing)
+            if err:
+                raise ValueError(err)
 
-                if t_in > t_out:
+            # In time cannot be greater than out time
+            if Message.IN_TIME in times and Message.OUT_TIME in times:
+                if times[Message.IN_TIME] > times[Message.OUT_TIME]:
                     raise ValueError('{} cannot be greater than {}'.format(Message.IN_TIME, Message.OUT_TIME))
 
             # Stale time cannot be greater than expires time
-            if Message.STALE_TIME in timing and Message.EXPIRES_TIME in timing:
-                t_stale = iso_data.parse_func(timing[Message.STALE_TIME])
-                t_exp = iso_data.parse_func(timing[Message.EXPIRES_TIME])
-
-                if t_stale > t_exp:
+            if Message.STALE_TIME in times and Message.EXPIRES_TIME in times:
+                if times[Message.STALE_TIME] > times[Message.EXPIRES_TIME]:
                     raise ValueError('{} cannot be greater than {}'.format(Message.STALE_TIME, Message.EXPIRES_TIME))
+
+
+# Validators for the decorators common to all messages, compiled once and
+# shared by every message.
+_validate_thread = compile_field(SchemaField({
+    Message.THREAD_ID: AnyField(),
+    Message.SENDER_ORDER: NonNegativeNumberField(),
+    Message.RECEIVED_ORDERS: MapField(DIDField(), NonNegativeNumberField(), optional=True, nullable=True),
+}))
+
+_validate_delay = compile_field(SchemaField({
+    Message.DELAY_MILLI: NonNegativeNumberField(optional=True),
+}))
+
+_iso_datetime = ISODatetimeStringField()
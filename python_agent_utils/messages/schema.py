@@ -0,0 +1,120 @@
+"""
+Compile field validators into plain functions.
+
+Validating through a tree of field objects repeats the same attribute lookups
+and method calls for every value. compile_field resolves them once and returns
+a function that, like FieldValidator.validate, takes a value and returns an
+error message or None. Compile schemas once, at import time, and reuse the
+result for every message.
+"""
+from typing import Any, Callable, Optional
+
+from .fields import AnyField, FieldBase, FieldValidator, IterableField, MapField, SchemaField
+
+Validator = Callable[[Any], Optional[str]]
+
+
+def compile_field(field: FieldValidator) -> Validator:
+    """
+    Build a function validating values the way field does.
+
+    :param field: field validator, possibly holding nested fields
+    :return: function returning an error message or None
+    """
+    if not isinstance(field, FieldBase):
+        return field.validate
+    if type(field) is AnyField:
+        return _accept
+
+    compiler = _COMPILERS.get(type(field))
+    specific = compiler(field) if compiler else field._specific_validation
+    base_types = field._base_types
+    nullable = field.nullable
+    wrong_type = field._wrong_type_msg
+
+    if base_types is None:
+        def validate(val):
+            if nullable and val is None:
+                return None
+            return specific(val) or None
+    else:
+        def validate(val):
+            if nullable and val is None:
+                return None
+            if not isinstance(val, base_types):
+                return wrong_type(val)
+            return specific(val) or None
+
+    return validate
+
+
+def _accept(_):
+    return None
+
+
+def _compile_iterable(field: IterableField) -> Validator:
+    inner = compile_field(field.inner_field_type)
+    min_length = field.min_length
+    max_length = field.max_length
+
+    def validate_items(val):
+        if min_length is not None and len(val) < min_length:
+            return 'length should be at least {}'.format(min_length)
+        if max_length is not None and len(val) > max_length:
+            return 'length should be at most {}'.format(max_length)
+        for v in val:
+            err = inner(v)
+            if err:
+                return err
+
+    return validate_items
+
+
+def _compile_map(field: MapField) -> Validator:
+    validate_key = compile_field(field.key_field)
+    validate_value = compile_field(field.value_field)
+
+    def validate_items(val):
+        for k, v in val.items():
+            err = validate_key(k) or validate_value(v)
+            if err:
+                return err
+
+    return validate_items
+
+
+def _compile_schema(field: SchemaField) -> Validator:
+    # Members accepting any value only need to be present.
+    present = [
+        name for name, member in field.fields.items()
+        if type(member) is AnyField and not member.optional
+    ]
+    members = [
+        (name, compile_field(member), member.optional)
+        for name, member in field.fields.items()
+        if type(member) is not AnyField
+    ]
+
+    def validate_members(val):
+        for name in present:
+            if name not in val:
+                return 'Attribute "{}" is missing'.format(name)
+        for name, validate, optional in members:
+            if name not in val:
+                if optional:
+                    continue
+                return 'Attribute "{}" is missing'.format(name)
+            err = validate(val[name])
+            if err:
+                return '{}: {}'.format(name, err)
+
+    return validate_members
+
+
+# Fields holding other fields, whose children are compiled too. Subclasses
+# may change the validation, so only these exact types are matched.
+_COMPILERS = {
+    IterableField: _compile_iterable,
+    MapField: _compile_map,
+    SchemaField: _compile_schema,
+}